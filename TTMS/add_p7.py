@@ -1,5 +1,7 @@
 import pymysql
 
+from utils.refdata import invalidate
+
 db = pymysql.connect(host='localhost', user='root', passwd='nazila', db='timetable_db4')
 cur = db.cursor()
 
@@ -12,6 +14,8 @@ for p in periods:
 
 # Add P7 only
 cur.execute('INSERT INTO periods (period_no, start_time, end_time) VALUES (7, "14:00", "14:45")')
+# Running app workers reload periods on their next version check
+invalidate(cur, "periods")
 db.commit()
 
 print('\nAdded P7')
@@ -1,5 +1,7 @@
 import pymysql
 
+from utils.refdata import invalidate
+
 # Connect to database
 db = pymysql.connect(host='localhost', user='root', passwd='nazila', db='timetable_db4')
 cur = db.cursor()
@@ -15,6 +17,8 @@ for p in periods:
 cur.execute("SELECT COUNT(*) FROM periods WHERE period_no = 7")
 if cur.fetchone()[0] == 0:
     cur.execute("INSERT INTO periods (period_no, start_time, end_time) VALUES (7, '14:00', '14:45')")
+    # Running app workers reload periods on their next version check
+    invalidate(cur, "periods")
     db.commit()
     print('\nAdded P7 (14:00-14:45)')
 else:
@@ -1,6 +1,4 @@
 from flask import Flask, render_template, request, redirect, session, jsonify
-import pymysql
-import random
 import sys
 import os
 from dotenv import load_dotenv
@@ -11,6 +9,18 @@ load_dotenv()
 # Add current directory to path to import utils
 sys.path.insert(0, os.path.dirname(__file__))
 from utils.auth import login_required
+from utils.db import get_db_connection, get_pool, release_db_connection
+from utils.problem import MAX_BLOCK, ROOM_TYPES
+from utils.snapshot import load_classes, load_snapshot, load_timetable_rows, save_result
+from utils.engines import ENGINES, get_engine
+from utils.assignments import set_staff_subjects
+from utils.workload import delete_timetable, load_workload
+from utils import refdata
+from utils.pipeline import run_engine
+from utils.batch import generate_all, unplaced_by_class
+from utils.impact import affected_classes, repair_classes
+from utils.feasibility import Infeasible
+from utils import jobs
 
 # Get the project root (current directory)
 BASE_DIR = os.path.dirname(__file__)
@@ -24,21 +34,8 @@ app = Flask(__name__,
 app.secret_key = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
 app.config['DEBUG'] = os.getenv('FLASK_ENV', 'production') == 'development'
 
-# Database credentials from environment variables
-DB_HOST = os.getenv('DB_HOST', 'localhost')
-DB_USER = os.getenv('DB_USER', 'root')
-DB_PASSWORD = os.getenv('DB_PASSWORD', '')
-DB_NAME = os.getenv('DB_NAME', 'timetable_db4')
-
-# ---------------- DB CONNECTION ----------------
-def get_db_connection():
-    return pymysql.connect(
-        host=DB_HOST,
-        user=DB_USER,
-        password=DB_PASSWORD,
-        database=DB_NAME,
-        cursorclass=pymysql.cursors.DictCursor
-    )
+# get_db_connection() hands every request one pooled connection, returned here
+app.teardown_appcontext(release_db_connection)
 
 # ---------------- HELPERS ----------------
 def get_request_data():
@@ -104,19 +101,18 @@ def admin_dashboard():
     conn = get_db_connection()
     cur = conn.cursor()
 
-    cur.execute("SELECT * FROM subjects")
-    subjects = cur.fetchall()
+    subjects = refdata.subjects(cur)
 
     cur.execute("SELECT * FROM staff")
     faculty = cur.fetchall()
 
-    cur.execute("SELECT * FROM courses")
-    courses = cur.fetchall()
+    courses = refdata.courses(cur)
 
     cur.close()
     conn.close()
 
-    return render_template("admin_dashboard.html", subjects=subjects, faculty=faculty, courses=courses)
+    return render_template("admin_dashboard.html", subjects=subjects, faculty=faculty, courses=courses,
+                           engines=ENGINES.values(), sync_time_budget=SYNC_TIME_BUDGET)
 
 # ---------------- ADD SUBJECT ----------------
 @app.route("/add_subject", methods=["POST"])
@@ -130,6 +126,8 @@ def add_subject():
     course_id = data.get("course_id", "").strip()
     semester = data.get("semester", "").strip()
     weekly_hours = data.get("weekly_hours", "4").strip()
+    required_room = data.get("required_room", "CLASSROOM").strip()
+    block_length = str(data.get("block_length", "1")).strip()
 
     # Validate required fields
     if not all([code, name, year, course_id, semester, weekly_hours]):
@@ -138,6 +136,12 @@ def add_subject():
             return json_response(False, msg)
         return redirect(f"/admin?error={msg}")
 
+    if required_room not in ROOM_TYPES or block_length not in [str(n) for n in range(1, MAX_BLOCK + 1)]:
+        msg = f"Room type must be one of {', '.join(ROOM_TYPES)} and block length 1 to {MAX_BLOCK}"
+        if request.is_json:
+            return json_response(False, msg)
+        return redirect(f"/admin?error={msg}")
+
     try:
         conn = get_db_connection()
         cur = conn.cursor()
@@ -145,11 +149,13 @@ def add_subject():
         # Convert course_id to int
         course_id = int(course_id)
         weekly_hours = int(weekly_hours)
+        block_length = int(block_length)
 
         cur.execute("""
-            INSERT INTO subjects (code, name, year, course_id, semester, weekly_hours)
-            VALUES (%s, %s, %s, %s, %s, %s)
-        """, (code, name, year, course_id, semester, weekly_hours))
+            INSERT INTO subjects (code, name, year, course_id, semester, weekly_hours, required_room, block_length)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        """, (code, name, year, course_id, semester, weekly_hours, required_room, block_length))
+        refdata.invalidate(cur, "subjects")
 
         conn.commit()
         cur.close()
@@ -191,32 +197,19 @@ def add_faculty():
             return json_response(False, msg)
         return redirect(f"/admin?error={msg}")
 
+    conn = get_db_connection()
+    cur = conn.cursor()
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-
         # Convert types
         max_hours = int(max_hours)
         subjects = [int(s) for s in subjects]
 
-        # Insert staff
+        # Staff row and subject assignments commit together, or not at all
         cur.execute("""
             INSERT INTO staff (staff_code, name, department, max_hours)
             VALUES (%s, %s, %s, %s)
         """, (staff_code, name, department, max_hours))
-
-        staff_db_id = cur.lastrowid
-        conn.commit()
-
-        # Assign subjects
-        for subject_id in subjects:
-            try:
-                cur.execute("""
-                    INSERT INTO staff_subjects (staff_id, subject_id)
-                    VALUES (%s, %s)
-                """, (staff_db_id, subject_id))
-            except Exception as subj_err:
-                continue
+        set_staff_subjects(cur, cur.lastrowid, subjects)
 
         conn.commit()
         cur.close()
@@ -226,6 +219,9 @@ def add_faculty():
             return json_response(True, "Faculty added successfully", redirect="/admin")
         return redirect("/admin?success=faculty_added")
     except Exception as e:
+        conn.rollback()
+        cur.close()
+        conn.close()
         if request.is_json:
             return json_response(False, str(e))
         return redirect(f"/admin?error=Error adding faculty")
@@ -243,20 +239,28 @@ def edit_subject(id):
         weekly_hours = data.get("weekly_hours")
 
         try:
+            block_length = int(data.get("block_length") or 1)
+            if not 1 <= block_length <= MAX_BLOCK:
+                raise ValueError(f"Block length must be 1 to {MAX_BLOCK}")
+            classes = affected_classes(cur, subject_ids=[id])
             cur.execute("""
                 UPDATE subjects
-                SET name=%s, weekly_hours=%s
+                SET name=%s, weekly_hours=%s, block_length=%s
                 WHERE id=%s
-            """, (name, weekly_hours, id))
+            """, (name, weekly_hours, block_length, id))
+            # Drop or add only the hours the new weekly_hours changes
+            impact = repair_classes(cur, classes)
+            refdata.invalidate(cur, "subjects")
 
             conn.commit()
             cur.close()
             conn.close()
 
             if request.is_json:
-                return json_response(True, "Subject updated", redirect="/admin")
+                return json_response(True, "Subject updated", redirect="/admin", repaired=impact.summary())
             return redirect("/admin")
         except Exception as e:
+            conn.rollback()
             if request.is_json:
                 return json_response(False, str(e))
             return str(e), 400
@@ -276,15 +280,19 @@ def delete_subject(id):
         conn = get_db_connection()
         cur = conn.cursor()
 
+        classes = affected_classes(cur, subject_ids=[id])
+        delete_timetable(cur, "t.subject_id=%s", (id,))
         cur.execute("DELETE FROM staff_subjects WHERE subject_id=%s", (id,))
         cur.execute("DELETE FROM subjects WHERE id=%s", (id,))
+        impact = repair_classes(cur, classes)
+        refdata.invalidate(cur, "subjects")
 
         conn.commit()
         cur.close()
         conn.close()
 
         if request.is_json:
-            return json_response(True, "Subject deleted")
+            return json_response(True, "Subject deleted", repaired=impact.summary())
         return redirect("/admin")
     except Exception as e:
         if request.is_json:
@@ -304,28 +312,26 @@ def edit_faculty(id):
         subjects = request.form.getlist("subjects")
 
         try:
+            classes = affected_classes(cur, staff_ids=[id], subject_ids=[int(s) for s in subjects])
             cur.execute("""
                 UPDATE staff SET name=%s, max_hours=%s WHERE id=%s
             """, (name, max_hours, id))
 
-            # Remove old subject assignments
-            cur.execute("DELETE FROM staff_subjects WHERE staff_id=%s", (id,))
-            
-            # Add new subject assignments
-            for subject_id in subjects:
-                cur.execute("""
-                    INSERT INTO staff_subjects (staff_id, subject_id)
-                    VALUES (%s, %s)
-                """, (id, subject_id))
+            # Write only the assignments that changed
+            set_staff_subjects(cur, id, subjects)
+
+            # Re-place only the rows the new assignments invalidate, in every class this staff touches
+            impact = repair_classes(cur, classes)
 
             conn.commit()
             cur.close()
             conn.close()
 
             if request.is_json:
-                return json_response(True, "Faculty updated", redirect="/admin")
+                return json_response(True, "Faculty updated", redirect="/admin", repaired=impact.summary())
             return redirect("/admin")
         except Exception as e:
+            conn.rollback()
             if request.is_json:
                 return json_response(False, str(e))
             return str(e), 400
@@ -333,8 +339,7 @@ def edit_faculty(id):
     cur.execute("SELECT * FROM staff WHERE id=%s", (id,))
     faculty = cur.fetchone()
 
-    cur.execute("SELECT id, code, name FROM subjects")
-    subjects = cur.fetchall()
+    subjects = refdata.subjects(cur)
 
     cur.execute("SELECT subject_id FROM staff_subjects WHERE staff_id=%s", (id,))
     assigned = [s["subject_id"] for s in cur.fetchall()]
@@ -357,19 +362,29 @@ def delete_faculty(id):
         conn = get_db_connection()
         cur = conn.cursor()
 
+        # Subjects only this staff member teaches have no timetable rows to find them by if never placed
+        cur.execute("SELECT subject_id FROM staff_subjects WHERE staff_id=%s", (id,))
+        taught = [r["subject_id"] for r in cur.fetchall()]
+        classes = affected_classes(cur, staff_ids=[id], subject_ids=taught)
         # Delete timetable entries first
-        cur.execute("DELETE FROM timetable WHERE staff_id=%s", (id,))
+        delete_timetable(cur, "t.staff_id=%s", (id,))
         # Then delete staff_subjects
         cur.execute("DELETE FROM staff_subjects WHERE staff_id=%s", (id,))
         # Finally delete staff
         cur.execute("DELETE FROM staff WHERE id=%s", (id,))
+        # Hand the freed hours to the remaining staff of those subjects
+        impact = repair_classes(cur, classes)
 
         conn.commit()
         cur.close()
         conn.close()
 
         if request.is_json:
-            return json_response(True, "Faculty deleted")
+            message = "Faculty deleted"
+            if impact.unstaffed:
+                codes = ", ".join(s["code"] for s in impact.unstaffed)
+                message += f"; no staff left to teach {codes}, their hours cannot be placed"
+            return json_response(True, message, repaired=impact.summary())
         return redirect("/admin")
     except Exception as e:
         if request.is_json:
@@ -382,8 +397,8 @@ def delete_faculty(id):
 def view_workload():
     conn = get_db_connection()
     cur = conn.cursor()
-    cur.execute("SELECT * FROM faculty_workload")
-    data = cur.fetchall()
+    # Read from the staff_load summary, kept current by every timetable write
+    data = load_workload(cur)
     cur.close()
     conn.close()
 
@@ -483,6 +498,53 @@ def view_faculty():
     return render_template("view_faculty.html", faculty=faculty)
 
 # -------- AI TIMETABLE GENERATION --------
+# Upper bound on the per-request soft-quality optimisation time
+MAX_OPTIMISE_SECONDS = 20
+# /generate and /generate_all must answer within gunicorn's 30s worker timeout, leaving time
+# for loading and saving; longer runs go through /jobs
+SYNC_TIME_BUDGET = 20
+JOB_TIME_BUDGET = 600
+MAX_STARTS = 8
+
+def get_generation_options(data, max_time_budget=SYNC_TIME_BUDGET):
+    """
+    Registered Engine and run_engine options of a generation request; raises
+    ValueError. The run may take at most max_time_budget seconds.
+    """
+    engine = get_engine(data.get("engine"))
+    # starts > 1 keeps the best of several seeded attempts; seed reproduces a run
+    try:
+        starts = int(data.get("starts") or 1)
+        seed = int(data["seed"]) if data.get("seed") not in (None, "") else None
+        # Seconds of simulated annealing on soft quality after placement; 0 skips it
+        optimise = float(data.get("optimise") or 0)
+        # Wall-clock cap on the whole run; the best timetable found by then is kept.
+        # Defaults to the engine's own budget plus the optimisation time
+        time_budget = float(data["time_budget"]) if data.get("time_budget") not in (None, "") else None
+    except (TypeError, ValueError):
+        raise ValueError("starts, seed, optimise and time_budget must be numbers")
+    if not 1 <= starts <= MAX_STARTS:
+        raise ValueError(f"starts must be between 1 and {MAX_STARTS}")
+    if not 0 <= optimise <= MAX_OPTIMISE_SECONDS:
+        raise ValueError(f"optimise must be between 0 and {MAX_OPTIMISE_SECONDS} seconds")
+    if time_budget is None:
+        time_budget = min(engine.time_budget + optimise, max_time_budget)
+    elif not 0 < time_budget <= max_time_budget:
+        message = f"time_budget must be between 0 and {max_time_budget} seconds"
+        if max_time_budget < JOB_TIME_BUDGET:
+            message += "; run longer generations in the background"
+        raise ValueError(message)
+    options = {
+        "starts": starts,
+        "seed": seed,
+        "repair": str(data.get("repair", "1")).lower() not in ("0", "false", "off"),
+        "optimise": optimise,
+        # force places what fits even when the feasibility check already shows hours will be left over
+        "check": str(data.get("force", "0")).lower() not in ("1", "true", "on"),
+        "time_budget": time_budget,
+    }
+    return engine, options
+
 @app.route("/generate", methods=["POST"])
 @login_required(role="admin")
 def generate_timetable():
@@ -491,35 +553,21 @@ def generate_timetable():
     course_id = data.get("course_id")
     semester = data.get("semester")
 
+    try:
+        engine, options = get_generation_options(data)
+    except ValueError as e:
+        if request.is_json:
+            return json_response(False, str(e))
+        return str(e), 400
+
     conn = get_db_connection()
     cur = conn.cursor()
 
     try:
-        # Delete existing timetable
-        cur.execute(
-            "DELETE FROM timetable WHERE year=%s AND course_id=%s AND semester=%s",
-            (year, course_id, semester)
-        )
-
-        # Get subjects for that year & course & semester
-        cur.execute("""
-            SELECT s.id, s.weekly_hours
-            FROM subjects s
-            WHERE s.year=%s AND s.course_id=%s AND s.semester=%s
-        """, (year, course_id, semester))
-        subjects = cur.fetchall()
-
-        # Get staff assignments
-        cur.execute("""
-            SELECT ss.staff_id, ss.subject_id
-            FROM staff_subjects ss
-            JOIN subjects s ON ss.subject_id = s.id
-            WHERE s.year=%s AND s.course_id=%s AND s.semester=%s
-        """, (year, course_id, semester))
-        assignments = cur.fetchall()
+        problem = load_snapshot(cur, [(year, course_id, semester)])
 
         # Check if there are assignments
-        if not assignments:
+        if not problem.lessons:
             cur.close()
             conn.close()
             msg = "Error: No staff assigned to subjects for this year and course. Please assign faculty to subjects first."
@@ -527,170 +575,31 @@ def generate_timetable():
                 return json_response(False, msg)
             return msg, 400
 
-        # Get period IDs mapped to period numbers
-        cur.execute("SELECT id, period_no FROM periods ORDER BY period_no")
-        period_data = cur.fetchall()
-        period_map = {int(p["period_no"]): p["id"] for p in period_data}
-
-        days = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
-        period_nos = sorted(period_map.keys())
-
-        staff_busy = {}
-        room_busy = {}
-        
-        # Load existing staff assignments from all timetables to avoid duplicates
-        cur.execute("""
-            SELECT staff_id, day, period_id
-            FROM timetable
-        """)
-        for row in cur.fetchall():
-            staff_id = row["staff_id"]
-            day = row["day"]
-            period_id = row["period_id"]
-            # Find period_no from period_id
-            period_no = None
-            for pno, pid in period_map.items():
-                if pid == period_id:
-                    period_no = pno
-                    break
-            if period_no:
-                staff_busy[(staff_id, day, period_no)] = True
-        
-        # Get available classrooms
-        cur.execute("SELECT id FROM classrooms")
-        rooms = [r["id"] for r in cur.fetchall()]
-        if not rooms:
-            rooms = [1]
-        
-        # Load existing room assignments from all timetables to avoid conflicts
-        cur.execute("""
-            SELECT classroom_id, day, period_id
-            FROM timetable
-        """)
-        for row in cur.fetchall():
-            classroom_id = row["classroom_id"]
-            day = row["day"]
-            period_id = row["period_id"]
-            # Find period_no from period_id
-            period_no = None
-            for pno, pid in period_map.items():
-                if pid == period_id:
-                    period_no = pno
-                    break
-            if period_no:
-                room_busy[(classroom_id, day, period_no)] = True
-        
-        # Load existing subject-per-day counts to enforce max 2 allocations per subject per day
-        subject_day_count = {}
-        cur.execute("""
-            SELECT subject_id, day, COUNT(*) as cnt
-            FROM timetable
-            GROUP BY subject_id, day
-        """)
-        for row in cur.fetchall():
-            sid = row["subject_id"]
-            day = row["day"]
-            subject_day_count[(sid, day)] = int(row["cnt"])
-
-        random.shuffle(assignments)
-        placed_count = 0
-
-        # Create a dictionary mapping subject_id to weekly_hours from subjects already fetched
-        subject_hours = {s["id"]: s["weekly_hours"] for s in subjects}
-
-        # Track which (day, period_no) slots are busy for this year/course
-        year_course_busy = {}
-
-        # Track remaining slots needed for each assignment
-        remaining_slots = {}
-        for assignment in assignments:
-            subject_id = assignment["subject_id"]
-            remaining_slots[subject_id] = subject_hours.get(subject_id, 1)
-
-        # Allocate slots in a round-robin fashion across assignments and days
-        # This ensures different subjects are spread throughout the week AND all days are used
-        max_iterations = sum(remaining_slots.values()) + 100  # Safety check to avoid infinite loops
-        iteration = 0
-        
-        # Keep track of which day to start with for better distribution
-        day_index = 0
-
-        while any(v > 0 for v in remaining_slots.values()) and iteration < max_iterations:
-            iteration += 1
-            assignments_shuffled = [a for a in assignments if remaining_slots[a["subject_id"]] > 0]
-            random.shuffle(assignments_shuffled)
-
-            for assignment in assignments_shuffled:
-                subject_id = assignment["subject_id"]
-                staff_id = assignment["staff_id"]
-
-                if remaining_slots[subject_id] <= 0:
-                    continue
-
-                # Try to allocate one slot for this subject
-                # Rotate through days to ensure all days get used before repeating
-                slot_allocated = False
-                days_to_try = days[day_index:] + days[:day_index]  # Start from current day_index
-                
-                for day in days_to_try:
-                    if slot_allocated:
-                        break
-                    # Enforce max 2 allocations per subject per day
-                    if subject_day_count.get((subject_id, day), 0) >= 2:
-                        continue
-                    period_nos_shuffled = period_nos.copy()
-                    random.shuffle(period_nos_shuffled)
-                    for period_no in period_nos_shuffled:
-                        if slot_allocated:
-                            break
-                        # Check year/course constraint - each year can only have one class per day/period
-                        if (day, period_no) in year_course_busy:
-                            continue
-                        if (staff_id, day, period_no) in staff_busy:
-                            continue
-
-                        # Find an available room for this slot
-                        room_found = None
-                        rooms_shuffled = rooms.copy()
-                        random.shuffle(rooms_shuffled)
-                        for room in rooms_shuffled:
-                            if (room, day, period_no) not in room_busy:
-                                room_found = room
-                                break
-
-                        if room_found is None:
-                            # No room available for this slot
-                            continue
-
-                        period_id = period_map[period_no]
-                        cur.execute("""
-                            INSERT INTO timetable
-                            (day, period_id, subject_id, staff_id, classroom_id, year, course_id, semester)
-                            VALUES (%s,%s,%s,%s,%s,%s,%s,%s)
-                        """, (day, period_id, subject_id, staff_id, room_found, year, course_id, semester))
-
-                        # Mark constraints as busy
-                        year_course_busy[(day, period_no)] = True
-                        staff_busy[(staff_id, day, period_no)] = True
-                        room_busy[(room_found, day, period_no)] = True
-                        # Update subject-day allocation count
-                        subject_day_count[(subject_id, day)] = subject_day_count.get((subject_id, day), 0) + 1
-                        remaining_slots[subject_id] -= 1
-                        placed_count += 1
-                        slot_allocated = True
-                        
-                        # Rotate day index for next allocation
-                        day_index = (day_index + 1) % len(days)
+        result = run_engine(problem, engine.solve, **options)
 
+        save_result(cur, problem, result)
         conn.commit()
         cur.close()
         conn.close()
 
         redirect_url = f"/view_timetable?year={year}&course_id={course_id}&semester={semester}&success=timetable_generated"
+        msg = f"Timetable generated! Placed {result.placed_count} assignments."
+        if result.unplaced:
+            msg += f" {result.unplaced_count} hours could not be placed."
         if request.is_json:
-            return json_response(True, f"Timetable generated! Placed {placed_count} assignments.", redirect=redirect_url)
+            return json_response(
+                True, msg, redirect=redirect_url,
+                engine=result.engine, seed=result.seed, unplaced=result.unplaced
+            )
         return redirect(redirect_url)
 
+    except Infeasible as e:
+        conn.rollback()
+        cur.close()
+        conn.close()
+        if request.is_json:
+            return json_response(False, str(e), issues=e.issues)
+        return str(e), 400
     except Exception as e:
         conn.rollback()
         cur.close()
@@ -700,6 +609,132 @@ def generate_timetable():
             return json_response(False, str(e))
         return error_msg, 500
 
+# -------- BATCH GENERATION (ALL CLASSES) --------
+@app.route("/generate_all", methods=["POST"])
+@login_required(role="admin")
+def generate_all_timetables():
+    data = get_request_data()
+    semester = data.get("semester") or None
+
+    try:
+        engine, options = get_generation_options(data)
+    except ValueError as e:
+        if request.is_json:
+            return json_response(False, str(e))
+        return str(e), 400
+
+    conn = get_db_connection()
+    try:
+        problem, result = generate_all(conn, engine.solve, semester=semester, **options)
+    except Infeasible as e:
+        conn.close()
+        if request.is_json:
+            return json_response(False, str(e), issues=e.issues)
+        return str(e), 400
+    except Exception as e:
+        conn.close()
+        if request.is_json:
+            return json_response(False, str(e))
+        return f"Error generating timetables: {str(e)}", 500
+    conn.close()
+
+    msg = f"Generated {len(problem.classes)} timetables. Placed {result.placed_count} assignments."
+    if result.unplaced:
+        msg += f" {result.unplaced_count} hours could not be placed."
+    if request.is_json:
+        return json_response(
+            True, msg, redirect="/master_timetable",
+            engine=result.engine, seed=result.seed, classes=len(problem.classes),
+            unplaced=unplaced_by_class(problem, result)
+        )
+    return redirect("/master_timetable?success=timetable_generated")
+
+# -------- BACKGROUND GENERATION JOBS --------
+@app.route("/jobs", methods=["POST"])
+@login_required(role="admin")
+def create_generation_job():
+    data = get_request_data()
+    scope = data.get("scope") or "class"
+
+    try:
+        engine, options = get_generation_options(data, max_time_budget=JOB_TIME_BUDGET)
+        if scope == "class":
+            year, course_id, semester = data.get("year"), data.get("course_id"), data.get("semester")
+            if not all([year, course_id, semester]):
+                raise ValueError("year, course_id and semester are required")
+            params = {"classes": [[year, int(course_id), semester]]}
+        elif scope == "all":
+            params = {"semester": data.get("semester") or None}
+        else:
+            raise ValueError(f"Unknown job scope: {scope}")
+    except ValueError as e:
+        return json_response(False, str(e)), 400
+
+    params.update(engine=engine.name, options=options)
+    conn = get_db_connection()
+    cur = conn.cursor()
+    job_id = jobs.create_job(cur, scope, params)
+    conn.commit()
+    cur.close()
+    conn.close()
+
+    jobs.submit(job_id, engine.solve)
+    return json_response(True, "Generation job queued", job_id=job_id, status_url=f"/jobs/{job_id}"), 202
+
+@app.route("/jobs/<int:job_id>")
+@login_required(role="admin")
+def generation_job_status(job_id):
+    conn = get_db_connection()
+    cur = conn.cursor()
+    # A job whose worker died would otherwise stay queued or running forever
+    jobs.recover_jobs(cur)
+    conn.commit()
+    job = jobs.get_job(cur, job_id)
+    cur.close()
+    conn.close()
+
+    if not job:
+        return json_response(False, "Job not found"), 404
+    return json_response(True, f"Job {job['state']}", job=job)
+
+@app.route("/jobs/<int:job_id>/cancel", methods=["POST"])
+@login_required(role="admin")
+def cancel_generation_job(job_id):
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cancelled = jobs.cancel_job(cur, job_id)
+    conn.commit()
+    job = jobs.get_job(cur, job_id)
+    cur.close()
+    conn.close()
+
+    if not job:
+        return json_response(False, "Job not found"), 404
+    if not cancelled:
+        return json_response(False, f"Job is already {job['state']}", job=job), 409
+    return json_response(True, "Cancellation requested", job=job)
+
+@app.route("/jobs/<int:job_id>/result")
+@login_required(role="admin")
+def generation_job_result(job_id):
+    conn = get_db_connection()
+    cur = conn.cursor()
+    job = jobs.get_job(cur, job_id)
+    if not job or job["state"] != "done":
+        cur.close()
+        conn.close()
+        if not job:
+            return json_response(False, "Job not found"), 404
+        return json_response(False, f"Job is {job['state']}", job=job), 409
+
+    params = job["params"]
+    classes = params.get("classes") or load_classes(cur, params.get("semester"))
+    timetables = load_timetable_rows(cur, classes)
+    cur.close()
+    conn.close()
+
+    return json_response(True, "Job result", job=job, timetables=timetables)
+
 # -------- FETCH TIMETABLE --------
 def get_timetable_dict(year, course_id, semester=None):
     conn = get_db_connection()
@@ -769,10 +804,7 @@ def view_timetable():
     cur = conn.cursor()
     course = ""
     try:
-        cur.execute("SELECT name FROM courses WHERE id=%s", (course_id,))
-        row = cur.fetchone()
-        if row:
-            course = row.get("name", "")
+        course = refdata.course_name(cur, course_id) or ""
     except Exception:
         course = ""
     cur.close()
@@ -801,10 +833,7 @@ def print_timetable():
     cur = conn.cursor()
     course = ""
     try:
-        cur.execute("SELECT name FROM courses WHERE id=%s", (course_id,))
-        row = cur.fetchone()
-        if row:
-            course = row.get("name", "")
+        course = refdata.course_name(cur, course_id) or ""
     except Exception:
         course = ""
     cur.close()
@@ -882,13 +911,22 @@ def master_timetable():
 def get_periods_api():
     conn = get_db_connection()
     cur = conn.cursor()
-    cur.execute("SELECT period_no, start_time, end_time FROM periods ORDER BY period_no")
-    periods = cur.fetchall()
+    periods = [
+        {"period_no": p.period_no, "start_time": p.start_time, "end_time": p.end_time}
+        for p in refdata.periods(cur)
+    ]
     cur.close()
     conn.close()
     
     return json_response(True, "Periods fetched", data=periods)
 
+# -------- API: DB POOL STATS --------
+@app.route("/api/db_pool")
+@login_required(role="admin")
+def db_pool_stats():
+    # Stats of the worker process that served this request
+    return json_response(True, "Connection pool stats", data=get_pool().stats())
+
 # -------- LOGOUT --------
 @app.route("/logout")
 def logout():
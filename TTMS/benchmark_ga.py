@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+"""
+Compare the single-population GA with the island model on synthetic data.
+
+Usage: python benchmark_ga.py [runs] [workers]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+from utils import generator
+
+
+def synthetic_class(n_subjects=14, hours=5, n_staff=5, seed=0):
+    rnd = random.Random(seed)
+    subjects = [{"id": i, "weekly_hours": hours} for i in range(1, n_subjects + 1)]
+    staff_map = {s["id"]: [rnd.randint(1, n_staff)] for s in subjects}
+    return subjects, staff_map, [1, 2]
+
+
+def measure(label, fn, runs):
+    started = time.perf_counter()
+    scores = [generator.fitness(fn(seed)) for seed in range(runs)]
+    elapsed = (time.perf_counter() - started) / runs
+    print(f"{label:28} {elapsed:8.3f}s/run   mean fitness {sum(scores) / runs:7.1f}")
+    return elapsed
+
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else generator.WORKERS
+    subjects, staff_map, rooms = synthetic_class()
+
+    print(f"POP={generator.POP} GEN={generator.GEN} islands={generator.ISLANDS} workers={workers}\n")
+    base = measure(
+        "single population",
+        lambda seed: generator.generate_timetable(subjects, staff_map, rooms, seed=seed),
+        runs,
+    )
+    islands = measure(
+        f"{generator.ISLANDS} islands",
+        lambda seed: generator.generate_timetable_islands(subjects, staff_map, rooms, workers=workers, seed=seed),
+        runs,
+    )
+    # Islands do ISLANDS times the work of the baseline
+    print(f"\nThroughput speedup vs baseline: {generator.ISLANDS * base / islands:.2f}x")
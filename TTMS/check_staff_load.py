@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+"""
+Nightly consistency check of the staff_load summary against the timetable.
+
+Exits 1 when any (staff, semester, day) count differs, so a scheduler can
+alert on it; --repair recounts the summary from the timetable.
+
+Usage: python check_staff_load.py [--repair]
+Cron:  0 2 * * * cd /path/to/TTMS && python check_staff_load.py
+"""
+import argparse
+import sys
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from utils.db import connect
+from utils.workload import mismatches, rebuild
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check staff_load against the timetable")
+    parser.add_argument("--repair", action="store_true", help="recount staff_load when it is off")
+    args = parser.parse_args(argv)
+
+    conn = connect()
+    try:
+        with conn.cursor() as cur:
+            wrong = mismatches(cur)
+            for staff_id, semester, day, summary, counted in wrong:
+                print(f'✗ Staff {staff_id} | {semester:4} | {day:9} | summary {summary}, timetable {counted}')
+            if wrong and args.repair:
+                rebuild(cur)
+                conn.commit()
+                print(f'✓ Rebuilt staff_load ({len(wrong)} entries were off)')
+                return 0
+        conn.rollback()
+    finally:
+        conn.close()
+
+    if wrong:
+        print(f'\n✗ staff_load differs from the timetable in {len(wrong)} entries')
+        return 1
+    print('✓ staff_load matches the timetable')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,5 +1,7 @@
 import pymysql
 
+from utils.refdata import invalidate
+
 conn = pymysql.connect(
     host='localhost',
     user='root',
@@ -79,6 +81,7 @@ try:
     """)
     print("✓ Staff-subject assignments inserted")
 
+    invalidate(cur, "classrooms", "courses", "subjects")
     conn.commit()
     print("\n✅ Database setup complete!")
     
@@ -1,53 +1,63 @@
-import pymysql
-import requests
-import time
-
-# Wait a bit for Flask to be ready
-time.sleep(1)
-
-# Get combinations from database
-db = pymysql.connect(host='localhost', user='root', passwd='nazila', db='timetable_db4')
-cur = db.cursor()
-cur.execute('''
-    SELECT DISTINCT year, course_id, semester 
-    FROM subjects 
-    ORDER BY year, course_id, semester
-''')
-combos = cur.fetchall()
-cur.close()
-db.close()
-
-print('Generating timetables for all combinations:\n')
-success = 0
-failed = 0
-
-for combo in combos:
-    year = combo[0]
-    course_id = combo[1]
-    semester = combo[2]
-    
+#!/usr/bin/env python
+"""
+Generate the timetables of every class in one joint solver pass.
+
+The institution is loaded once, all classes are scheduled together and the
+result replaces their timetables in a single transaction.
+
+Usage: python gen_all_timetables.py [--engine greedy|csp|ga] [--semester ODD|EVEN] [--starts N] [--seed N] [--no-repair] [--optimise SECONDS] [--force] [--time-budget SECONDS]
+"""
+import argparse
+import sys
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from utils.batch import generate_all, unplaced_by_class
+from utils.db import connect
+from utils.engines import DEFAULT_ENGINE, ENGINES
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate all class timetables at once")
+    parser.add_argument("--engine", choices=sorted(ENGINES), default=DEFAULT_ENGINE)
+    parser.add_argument("--semester", help="only regenerate classes of this semester")
+    parser.add_argument("--starts", type=int, default=1, help="keep the best of N seeded runs")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--no-repair", dest="repair", action="store_false", help="skip the unplaced-hours repair pass")
+    parser.add_argument("--optimise", type=float, default=0, help="seconds of soft-quality annealing after placement")
+    parser.add_argument("--force", action="store_true", help="place what fits even if the feasibility check fails")
+    parser.add_argument("--time-budget", type=float, help="wall-clock seconds for the run (default: the engine's budget)")
+    args = parser.parse_args(argv)
+
+    engine = ENGINES[args.engine]
+    time_budget = args.time_budget or engine.time_budget + args.optimise
+    conn = connect()
     try:
-        response = requests.post(
-            'http://127.0.0.1:5000/generate',
-            json={'year': year, 'course_id': course_id, 'semester': semester},
-            timeout=60
+        problem, result = generate_all(
+            conn, engine.solve,
+            semester=args.semester, starts=args.starts, seed=args.seed, repair=args.repair,
+            optimise=args.optimise, check=not args.force, time_budget=time_budget
         )
-        
-        if response.status_code == 200:
-            print(f'✓ Year {year:10} | Course {course_id} | Semester {semester:6} | Status: {response.status_code}')
-            success += 1
-        else:
-            print(f'✗ Year {year:10} | Course {course_id} | Semester {semester:6} | Status: {response.status_code}')
-            failed += 1
-            print(f'  Response: {response.text[:100]}')
-            
-    except requests.exceptions.ConnectionError:
-        print(f'✗ Year {year:10} | Course {course_id} | Semester {semester:6} | Connection Error')
-        failed += 1
     except Exception as e:
-        print(f'✗ Year {year:10} | Course {course_id} | Semester {semester:6} | Error: {str(e)[:50]}')
-        failed += 1
+        print(f'✗ Generation failed: {e}')
+        return 1
+    finally:
+        conn.close()
+
+    unplaced = unplaced_by_class(problem, result)
+    print(f'Generated {len(problem.classes)} timetables with engine {result.engine} (seed {result.seed})\n')
+    for year, course_id, semester in problem.classes:
+        missing = unplaced.get(f'{year}/{course_id}/{semester}', 0)
+        mark = '✓' if not missing else '✗'
+        print(f'{mark} Year {year:4} | Course {course_id} | Semester {semester:6} | Unplaced hours: {missing}')
+
+    print(f'\n{"="*60}')
+    print(f'Placed {result.placed_count} hours, {result.unplaced_count} unplaced, in {result.elapsed:.2f}s')
+    print(f'{"="*60}')
+    return 0
+
 
-print(f'\n{"="*60}')
-print(f'Results: {success} successful, {failed} failed')
-print(f'{"="*60}')
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+"""
+Bring the database schema up to date, in place and without data loss.
+
+Safe to run on every deploy: applied migrations are skipped and a run that
+was interrupted picks up where it stopped.
+
+Usage: python migrate.py [--to VERSION] [--status]
+"""
+import argparse
+import sys
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from utils.db import connect
+from utils.migrations import MIGRATIONS, current_version, migrate
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply pending schema migrations")
+    parser.add_argument("--to", type=int, dest="target", help="stop after this migration version")
+    parser.add_argument("--status", action="store_true", help="only show the current and latest versions")
+    args = parser.parse_args(argv)
+
+    conn = connect()
+    try:
+        if args.status:
+            with conn.cursor() as cur:
+                version = current_version(cur)
+            print(f'Schema version {version}, latest {MIGRATIONS[-1].version}')
+            return 0
+        applied = migrate(conn, target=args.target, log=lambda line: print(f'→ {line}'))
+    except Exception as e:
+        print(f'✗ Migration failed: {e}')
+        return 1
+    finally:
+        conn.close()
+
+    if applied:
+        print(f'✓ Applied {len(applied)} migration(s), schema is at version {applied[-1]}')
+    else:
+        print('✓ Schema is up to date')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -11,6 +11,7 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'backend'))
 
 # Import config
 from config import DB_CONFIG
+from utils.migrations import migrate
 
 # Read schema
 schema_path = os.path.join(os.path.dirname(__file__), 'database', 'schema.sql')
@@ -52,7 +53,11 @@ try:
             print(f"✓ Executed statement {count}")
     
     connection.commit()
-    print(f"\n✅ Database setup completed successfully! ({count} statements executed)")
+
+    # schema.sql is the baseline; later changes come from the migrations
+    connection.cursorclass = pymysql.cursors.DictCursor
+    applied = migrate(connection, log=lambda line: print(f"✓ {line}"))
+    print(f"\n✅ Database setup completed successfully! ({count} statements, {len(applied)} migrations executed)")
     
 except Exception as e:
     print(f"\n❌ Error executing schema: {e}")
@@ -147,6 +147,69 @@ function setupGenerateForm() {
     // No need for AJAX interception - let forms submit normally
 }
 
+function submitGeneration(form) {
+    // Time limits past the request timeout only run as background jobs
+    const budget = form.elements.time_budget.selectedOptions[0];
+    if (budget && budget.dataset.background) {
+        runGenerationJob(form);
+        return false;
+    }
+    return true;
+}
+
+// How often a watched generation job is polled
+const JOB_POLL_MS = 1500;
+
+async function runGenerationJob(form) {
+    // Queue the form as a background job and follow its progress
+    const res = await fetch("/jobs", { method: "POST", body: new FormData(form) });
+    const json = await res.json();
+    if (!json.success) {
+        alert(json.message || "Failed to start generation");
+        return;
+    }
+    watchGenerationJob(json.job_id);
+}
+
+function watchGenerationJob(jobId) {
+    const box = qs("job-progress");
+    const status = qs("job-status");
+    const cancel = qs("job-cancel");
+    box.style.display = "block";
+    cancel.disabled = false;
+    cancel.onclick = () => {
+        cancel.disabled = true;
+        apiCall(`/jobs/${jobId}/cancel`, "POST");
+    };
+
+    const show = (job) => {
+        let text = `Job ${job.id}: ${job.state} (${job.progress}%)`;
+        if (job.placed !== null) text += `, ${job.placed} hours placed, ${job.unplaced} unplaced`;
+        if (job.score !== null) text += `, score ${job.score}`;
+        if (job.solve_seconds !== null) text += `, ${Number(job.solve_seconds).toFixed(1)}s`;
+        if (job.message) text += ` - ${job.message}`;
+        status.textContent = text;
+    };
+
+    // Poll the status route: a cheap request, where a held-open stream would tie up a sync worker
+    const poll = async () => {
+        const res = await fetch(`/jobs/${jobId}`);
+        const json = await res.json();
+        if (!json.success) {
+            status.textContent = json.message || "Job not found";
+            cancel.disabled = true;
+            return;
+        }
+        show(json.job);
+        if (["done", "failed", "cancelled"].includes(json.job.state)) {
+            cancel.disabled = true;
+            return;
+        }
+        setTimeout(poll, JOB_POLL_MS);
+    };
+    poll();
+}
+
 /* =========================
    AUTO INIT
 ========================= */
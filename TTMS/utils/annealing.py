@@ -0,0 +1,201 @@
+"""
+Simulated-annealing optimiser for soft timetable quality.
+
+Runs on a finished Result and lowers the weighted penalty of utils/quality.py
+(class and staff gaps, staff daily overload, doubled subjects) with two
+neighbourhoods: move one placement (a single hour or a whole block) to another
+free slot, or swap the slots of two same-length placements of one class.
+Every move is checked against the occupancy masks, so hard constraints hold
+throughout. Scores are updated incrementally: a move only re-evaluates the
+few class-days, staff-days and subject-days it touches.
+"""
+import math
+import random
+import time
+
+from utils.control import UNLIMITED
+from utils.occupancy import Occupancy, iter_bits
+from utils.problem import Placement, Result
+from utils.quality import STAFF_DAY_LIMIT, WEIGHTS, soft_penalty
+
+TIME_BUDGET = 2.0
+START_TEMPERATURE = 3.0
+END_TEMPERATURE = 0.05
+
+
+def _gaps(day_mask):
+    """Idle periods between the first and last busy period of a day mask"""
+    if not day_mask:
+        return 0
+    low = (day_mask & -day_mask).bit_length() - 1
+    return day_mask.bit_length() - low - day_mask.bit_count()
+
+
+class _State:
+    def __init__(self, problem, result):
+        self.occ = Occupancy.from_problem(problem)
+        self.lessons = {lesson.subject_id: lesson for lesson in problem.lessons}
+        self.day_counts = problem.booked_day_counts()
+        self.day_mask = (1 << self.occ.n_periods) - 1
+        # [lesson, start slot, length, staff_id, room_id] per placed block (single hours have length 1)
+        self.placed = []
+        for lesson, slot, length, staff_id, room_id in self.occ.units(problem.lessons, result.placements):
+            self.occ.book(slot, staff_id, room_id, lesson.class_key, length)
+            self.day_counts[lesson.subject_id][slot // self.occ.n_periods] += length
+            self.placed.append([lesson, slot, length, staff_id, room_id])
+
+    # -------- SCORING --------
+    def _day_bits(self, mask, d):
+        return (mask >> (d * self.occ.n_periods)) & self.day_mask
+
+    def local_penalty(self, keys):
+        """Weighted penalty of the given ("class"|"staff"|"subject", id, day) terms"""
+        total = 0
+        for kind, key, d in keys:
+            if kind == "class":
+                total += WEIGHTS["class_gap"] * _gaps(self._day_bits(self.occ.klass.get(key, 0), d))
+            elif kind == "staff":
+                bits = self._day_bits(self.occ.staff.get(key, 0), d)
+                total += WEIGHTS["staff_gap"] * _gaps(bits)
+                total += WEIGHTS["staff_overload"] * max(0, bits.bit_count() - STAFF_DAY_LIMIT)
+            else:
+                total += WEIGHTS["subject_double"] * (self.day_counts[key][d] > self.lessons[key].block)
+        return total
+
+    def total_penalty(self):
+        keys = set()
+        for lesson, slot, _, staff_id, _ in self.placed:
+            keys.update(self.terms(lesson, slot, staff_id))
+        return self.local_penalty(keys)
+
+    def terms(self, lesson, slot, staff_id):
+        d = slot // self.occ.n_periods
+        return (("class", lesson.class_key, d), ("staff", staff_id, d), ("subject", lesson.subject_id, d))
+
+    # -------- MOVES --------
+    def release(self, i):
+        lesson, slot, length, staff_id, room_id = self.placed[i]
+        self.occ.release(slot, staff_id, room_id, lesson.class_key, length)
+        self.day_counts[lesson.subject_id][slot // self.occ.n_periods] -= length
+
+    def book(self, i, slot, staff_id, room_id=None):
+        lesson, length = self.placed[i][0], self.placed[i][2]
+        if room_id is None:
+            room_id = self.occ.free_room(slot, lesson.room_type, length)
+        self.occ.book(slot, staff_id, room_id, lesson.class_key, length)
+        self.day_counts[lesson.subject_id][slot // self.occ.n_periods] += length
+        self.placed[i] = [lesson, slot, length, staff_id, room_id]
+
+    def fits(self, lesson, slot, length, staff_id):
+        return (
+            self.day_counts[lesson.subject_id][slot // self.occ.n_periods] + length <= lesson.day_cap
+            and self.occ.free_starts(staff_id, lesson.class_key, lesson.room_type, length) >> slot & 1
+        )
+
+
+def _try_move(state, rng, temperature):
+    """Move one placement to a random free slot; returns the accepted delta or None"""
+    i = rng.randrange(len(state.placed))
+    lesson, old_slot, length, old_staff, old_room = state.placed[i]
+    staff_id = rng.choice(lesson.staff_ids)
+    state.release(i)
+    free = state.occ.free_starts(staff_id, lesson.class_key, lesson.room_type, length) & ~(1 << old_slot)
+    targets = [s for s in iter_bits(free) if state.fits(lesson, s, length, staff_id)]
+    if not targets:
+        state.book(i, old_slot, old_staff, old_room)
+        return None
+    slot = rng.choice(targets)
+
+    state.book(i, old_slot, old_staff, old_room)
+    keys = set(state.terms(lesson, old_slot, old_staff) + state.terms(lesson, slot, staff_id))
+    before = state.local_penalty(keys)
+    state.release(i)
+    state.book(i, slot, staff_id)
+    delta = state.local_penalty(keys) - before
+    if delta <= 0 or rng.random() < math.exp(-delta / temperature):
+        return delta
+    state.release(i)
+    state.book(i, old_slot, old_staff, old_room)
+    return None
+
+
+def _try_swap(state, rng, temperature, by_class):
+    """Swap the slots of two same-length placements of one class; returns the accepted delta or None"""
+    members = by_class[rng.choice(list(by_class))]
+    if len(members) < 2:
+        return None
+    i, j = rng.sample(members, 2)
+    a, b = list(state.placed[i]), list(state.placed[j])
+    if a[1] == b[1] or a[0].subject_id == b[0].subject_id or a[2] != b[2]:
+        return None
+
+    keys = set(state.terms(a[0], a[1], a[3]) + state.terms(b[0], b[1], b[3])
+               + state.terms(a[0], b[1], a[3]) + state.terms(b[0], a[1], b[3]))
+    before = state.local_penalty(keys)
+    state.release(i)
+    state.release(j)
+    if state.fits(a[0], b[1], a[2], a[3]):
+        state.book(i, b[1], a[3])
+        if state.fits(b[0], a[1], b[2], b[3]):
+            state.book(j, a[1], b[3])
+            delta = state.local_penalty(keys) - before
+            if delta <= 0 or rng.random() < math.exp(-delta / temperature):
+                return delta
+            state.release(j)
+        state.release(i)
+    state.book(i, a[1], a[3], a[4])
+    state.book(j, b[1], b[3], b[4])
+    return None
+
+
+def optimise(problem, result, seed=None, time_budget=TIME_BUDGET, control=UNLIMITED):
+    """Lower result's soft penalty within time_budget seconds; hard constraints are kept"""
+    started = time.perf_counter()
+    time_budget = control.budget(time_budget)
+    if not result.placements:
+        return result
+    rng = random.Random(seed)
+    state = _State(problem, result)
+
+    by_class = {}
+    for i, (lesson, _, _, _, _) in enumerate(state.placed):
+        by_class.setdefault(lesson.class_key, []).append(i)
+
+    penalty = state.total_penalty()
+    best_penalty = penalty
+    best = [list(entry) for entry in state.placed]
+    temperature = START_TEMPERATURE
+    steps = 0
+    while True:
+        steps += 1
+        if steps % 100 == 0:
+            progress = (time.perf_counter() - started) / time_budget if time_budget else 1
+            if progress >= 1 or control.cancelled():
+                break
+            control.report(score=best_penalty)
+            temperature = START_TEMPERATURE * (END_TEMPERATURE / START_TEMPERATURE) ** progress
+
+        if rng.random() < 0.5:
+            delta = _try_move(state, rng, temperature)
+        else:
+            delta = _try_swap(state, rng, temperature, by_class)
+        if delta is None:
+            continue
+        penalty += delta
+        if penalty < best_penalty:
+            best_penalty = penalty
+            best = [list(entry) for entry in state.placed]
+
+    placements = [
+        Placement(*state.occ.day_period(s), lesson.subject_id, staff_id, room_id, lesson.class_key)
+        for lesson, slot, length, staff_id, room_id in best
+        for s in range(slot, slot + length)
+    ]
+    return Result(
+        placements=placements,
+        unplaced=dict(result.unplaced),
+        engine=f"{result.engine}+anneal",
+        seed=result.seed,
+        elapsed=result.elapsed + time.perf_counter() - started,
+        penalty=soft_penalty(problem, placements),
+    )
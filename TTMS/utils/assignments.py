@@ -0,0 +1,31 @@
+"""
+Batched writes of staff-to-subject assignments.
+
+Callers pass the full set of subjects a staff member should teach. Only
+the difference to what is stored is written: one multi-row INSERT for the
+new pairs and one DELETE for the dropped ones, on the caller's cursor so
+they commit (or roll back) together with the rest of the request.
+"""
+from utils.db import in_clause
+
+
+def set_staff_subjects(cur, staff_id, subject_ids):
+    """Make staff_id teach exactly subject_ids; returns (added, removed) subject ids"""
+    cur.execute("SELECT subject_id FROM staff_subjects WHERE staff_id=%s FOR UPDATE", (staff_id,))
+    current = {row["subject_id"] for row in cur.fetchall()}
+    wanted = {int(s) for s in subject_ids}
+    added = sorted(wanted - current)
+    removed = sorted(current - wanted)
+
+    if removed:
+        cur.execute(
+            f"DELETE FROM staff_subjects WHERE staff_id=%s AND {in_clause('subject_id', removed)}",
+            [staff_id, *removed]
+        )
+    if added:
+        # PyMySQL sends an INSERT ... VALUES executemany as a single multi-row statement
+        cur.executemany(
+            "INSERT INTO staff_subjects (staff_id, subject_id) VALUES (%s, %s)",
+            [(staff_id, subject_id) for subject_id in added]
+        )
+    return added, removed
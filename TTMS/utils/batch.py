@@ -0,0 +1,38 @@
+"""
+Institution-wide generation: every class is loaded in one snapshot, solved
+jointly in a single engine run and written back in one transaction.
+
+Generating classes one by one lets the first classes take the best staff
+slots; solving them together lets the engine trade slots between classes.
+"""
+from utils.pipeline import run_engine
+from utils.snapshot import load_classes, load_snapshot, save_result
+
+
+def generate_all(conn, engine, semester=None, **options):
+    """Regenerate all classes (of one semester, if given); options go to run_engine"""
+    cur = conn.cursor()
+    try:
+        classes = load_classes(cur, semester)
+        if not classes:
+            raise ValueError("No subjects found to generate timetables for")
+        problem = load_snapshot(cur, classes)
+        result = run_engine(problem, engine, **options)
+        save_result(cur, problem, result)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+    return problem, result
+
+
+def unplaced_by_class(problem, result):
+    """Unplaced hours keyed by "year/course_id/semester" """
+    class_of = {lesson.subject_id: lesson.class_key for lesson in problem.lessons}
+    totals = {}
+    for subject_id, hours in result.unplaced.items():
+        key = "/".join(str(v) for v in class_of[subject_id])
+        totals[key] = totals.get(key, 0) + hours
+    return totals
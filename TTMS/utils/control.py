@@ -0,0 +1,62 @@
+"""
+Run control shared by the generation engines: a wall-clock budget, a
+cancellation token and a progress callback.
+
+Engines poll ``stopped()`` between steps and, once it is true, return the
+best solution they have so far instead of raising, so a run that is out of
+time or cancelled still produces a usable (partial) timetable. Any object
+with an ``is_set()`` method works as the cancellation token: a
+threading.Event, or the job-table poller in utils.jobs. Progress is passed
+to ``on_progress`` as a dict with the elapsed seconds added, at most once
+every REPORT_INTERVAL seconds.
+"""
+import time
+
+REPORT_INTERVAL = 0.5
+
+
+class RunControl:
+    def __init__(self, time_budget=None, cancel=None, on_progress=None, deadline=None):
+        self.started = time.monotonic()
+        if deadline is None and time_budget is not None:
+            deadline = self.started + time_budget
+        # time.monotonic() value, so it can be handed to worker processes as is
+        self.deadline = deadline
+        self.cancel = cancel
+        self.on_progress = on_progress
+        self._reported = 0.0
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def cancelled(self):
+        return self.cancel is not None and self.cancel.is_set()
+
+    def expired(self):
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def stopped(self):
+        """True once the budget is spent or the run was cancelled"""
+        return self.expired() or self.cancelled()
+
+    def budget(self, seconds):
+        """seconds, cut down to what is left of the run's budget"""
+        if self.cancelled():
+            return 0.0
+        if self.deadline is None:
+            return seconds
+        return max(0.0, min(seconds, self.deadline - time.monotonic()))
+
+    def report(self, force=False, **progress):
+        """Pass progress (placed, unplaced, score, ...) to on_progress, throttled"""
+        if self.on_progress is None:
+            return
+        now = time.monotonic()
+        if not force and now - self._reported < REPORT_INTERVAL:
+            return
+        self._reported = now
+        self.on_progress(dict(progress, elapsed=round(now - self.started, 2)))
+
+
+# Control of runs started without one: no budget, never cancelled, reports dropped
+UNLIMITED = RunControl()
@@ -0,0 +1,258 @@
+"""
+Constraint-propagation engine: MRV ordering, forward checking, backtracking.
+
+Each lesson is a variable that still needs ``remaining`` hours. Its domain is
+the set of (slot, staff) pairs where the staff member, the class and a room
+are free and the subject is under its per-day cap. Block lessons take a
+whole block per step, so their domain is the set of free block starts. The
+units of one lesson with the same length are interchangeable, so they are
+placed in increasing slot order to avoid exploring permutations of the same
+timetable. A shorter leftover unit (hours not a multiple of the block) is
+not ordered against the full blocks.
+
+Search is bounded by a wall-clock budget. If no full placement is found in
+the first half of it (or the problem is infeasible) the second half runs a
+branch and bound that maximises placed hours, and the leftover hours are
+reported as unplaced. The run's control cuts the budget short: when it is
+stopped the best placement found so far is returned.
+"""
+import random
+import time
+
+from utils.control import UNLIMITED
+from utils.occupancy import Occupancy, iter_bits
+from utils.problem import Placement, Result
+
+TIME_BUDGET = 10.0
+
+
+class _Search:
+    def __init__(self, problem, seed, ordered=True):
+        self.problem = problem
+        self.ordered = ordered
+        self.rng = random.Random(seed)
+        self.occ = Occupancy.from_problem(problem)
+        self.day_counts = problem.booked_day_counts()
+
+        self.remaining = {l.subject_id: l.hours for l in problem.lessons}
+        # (subject_id, unit length) -> start slot of the last unit of that length placed
+        self.last_slot = {}
+        self.total = sum(self.remaining.values())
+        # (lesson, start slot, length, staff_id, room_id) per placed block
+        self.placements = []
+        self.placed_hours = 0
+
+    # -------- DOMAINS --------
+    def domain(self, lesson):
+        """Mask of slots where lesson's next block can start, ignoring which staff member takes it"""
+        occ = self.occ
+        counts = self.day_counts[lesson.subject_id]
+        length = lesson.unit(self.remaining[lesson.subject_id])
+        allowed = 0
+        for d, mask in enumerate(occ.day_masks):
+            if counts[d] + length <= lesson.day_cap:
+                allowed |= mask
+        allowed &= occ.full & ~((1 << (self.last_slot.get((lesson.subject_id, length), -1) + 1)) - 1)
+        union = 0
+        for staff_id in lesson.staff_ids:
+            union |= occ.free_starts(staff_id, lesson.class_key, lesson.room_type, length)
+        return union & allowed
+
+    def capacity(self, lesson, domain):
+        """Upper bound on the hours lesson can still get, honouring the day cap"""
+        counts = self.day_counts[lesson.subject_id]
+        length = lesson.unit(self.remaining[lesson.subject_id])
+        total = 0
+        for d, mask in enumerate(self.occ.day_masks):
+            free = (domain & mask).bit_count()
+            if free:
+                total += min(lesson.day_cap - counts[d], free * length)
+        return total
+
+    def select(self, target):
+        """
+        Pick the most constrained open lesson and its values.
+
+        Returns None when no open lesson can take another hour, and False when
+        an upper bound on the final placed count falls below target.
+        """
+        occ = self.occ
+        best = None
+        best_key = None
+        class_bound = {}
+        staff_need = {}
+        for lesson in self.problem.lessons:
+            need = self.remaining[lesson.subject_id]
+            if need <= 0:
+                continue
+            domain = self.domain(lesson)
+            capacity = self.capacity(lesson, domain)
+            class_bound[lesson.class_key] = class_bound.get(lesson.class_key, 0) + min(need, capacity)
+            if len(lesson.staff_ids) == 1:
+                staff_need[lesson.staff_ids[0]] = staff_need.get(lesson.staff_ids[0], 0) + need
+            if not capacity:
+                continue
+            key = (capacity - need, len(lesson.staff_ids), -need)
+            if best_key is None or key < best_key:
+                best, best_key, best_domain = lesson, key, domain
+
+        # A class can never take more hours than it has free slots
+        bound = self.placed_hours
+        for class_key, hours in class_bound.items():
+            free = (~(occ.klass.get(class_key, 0) | occ.rooms_full) & occ.full).bit_count()
+            bound += min(hours, free)
+        if bound < target:
+            return False
+        if target >= self.total:
+            for staff_id, need in staff_need.items():
+                if need > (~(occ.staff.get(staff_id, 0) | occ.rooms_full) & occ.full).bit_count():
+                    return False
+        if best is None:
+            return None
+        return best, self.candidates(best, best_domain)
+
+    def candidates(self, lesson, domain):
+        """(slot, staff_id) values for lesson, spreading hours over the week first"""
+        occ = self.occ
+        counts = self.day_counts[lesson.subject_id]
+        slots = list(iter_bits(domain))
+        if self.ordered:
+            order = {slot: (counts[slot // occ.n_periods], slot // occ.n_periods, self.rng.random()) for slot in slots}
+        else:
+            # Without slot ordering, balance room usage across the week instead
+            order = {
+                slot: (counts[slot // occ.n_periods], occ.slot_rooms[slot].bit_count(), self.rng.random())
+                for slot in slots
+            }
+        slots.sort(key=order.__getitem__)
+
+        length = lesson.unit(self.remaining[lesson.subject_id])
+        staff_free = {
+            staff_id: occ.free_starts(staff_id, lesson.class_key, lesson.room_type, length)
+            for staff_id in lesson.staff_ids
+        }
+        # Staff with more slack (free slots, capped by max_hours budget) first, so tight staff
+        # are kept for where they are needed
+        staff_order = sorted(
+            lesson.staff_ids, key=lambda s: -min(staff_free[s].bit_count(), occ.budget_left(s))
+        )
+        values = []
+        for slot in slots:
+            bit = 1 << slot
+            for staff_id in staff_order:
+                if staff_free[staff_id] & bit:
+                    values.append((slot, staff_id))
+        return values
+
+    # -------- MOVES --------
+    def apply(self, lesson, slot, staff_id):
+        length = lesson.unit(self.remaining[lesson.subject_id])
+        room_id = self.occ.free_room(slot, lesson.room_type, length)
+        self.occ.book(slot, staff_id, room_id, lesson.class_key, length)
+        self.day_counts[lesson.subject_id][slot // self.occ.n_periods] += length
+        self.remaining[lesson.subject_id] -= length
+        self.placed_hours += length
+        previous = self.last_slot.get((lesson.subject_id, length), -1)
+        if self.ordered:
+            self.last_slot[lesson.subject_id, length] = slot
+        self.placements.append((lesson, slot, length, staff_id, room_id))
+        return previous
+
+    def undo(self, previous):
+        lesson, slot, length, staff_id, room_id = self.placements.pop()
+        self.occ.release(slot, staff_id, room_id, lesson.class_key, length)
+        self.day_counts[lesson.subject_id][slot // self.occ.n_periods] -= length
+        self.remaining[lesson.subject_id] += length
+        self.placed_hours -= length
+        self.last_slot[lesson.subject_id, length] = previous
+
+    # -------- SEARCH --------
+    def run(self, deadline, target, control=UNLIMITED):
+        """
+        Depth-first branch and bound; returns the best placements found and
+        their hour count.
+
+        Branches that cannot reach target placed hours are pruned. After each
+        improvement the target is raised past it, so with target == total this
+        is plain backtracking with forward checking.
+        """
+        best = list(self.placements)
+        best_hours = self.placed_hours
+        stack = []
+        first = self.select(target)
+        if first:
+            stack.append([first[0], first[1], 0, None])
+        elif first is None:
+            return best, best_hours
+
+        nodes = 0
+        while stack:
+            frame = stack[-1]
+            if frame[3] is not None:
+                self.undo(frame[3])
+                frame[3] = None
+            if frame[2] >= len(frame[1]):
+                stack.pop()
+                continue
+
+            nodes += 1
+            if nodes % 64 == 0:
+                if time.perf_counter() > deadline or control.cancelled():
+                    break
+                control.report(placed=best_hours, unplaced=self.total - best_hours)
+
+            lesson, values, index = frame[0], frame[1], frame[2]
+            slot, staff_id = values[index]
+            frame[2] = index + 1
+            frame[3] = self.apply(lesson, slot, staff_id)
+            if self.placed_hours > best_hours:
+                best = list(self.placements)
+                best_hours = self.placed_hours
+
+            nxt = self.select(target)
+            if nxt is None:
+                if best_hours >= self.total:
+                    break
+                target = max(target, best_hours + 1)
+                continue
+            if nxt is False:
+                continue
+            stack.append([nxt[0], nxt[1], 0, None])
+        return best, best_hours
+
+
+def solve_csp(problem, seed=None, control=UNLIMITED, time_budget=TIME_BUDGET):
+    """Backtracking search for a full placement within time_budget seconds (or the control's budget)"""
+    started = time.perf_counter()
+    time_budget = control.budget(time_budget)
+    search = _Search(problem, seed)
+    best, best_hours = search.run(started + time_budget / 2, search.total, control)
+
+    if best_hours < search.total:
+        # No full placement (or out of time): maximise placed hours instead,
+        # starting from an unpruned MRV dive
+        relaxed = _Search(problem, seed, ordered=False)
+        placed, placed_hours = relaxed.run(started + time_budget, 0, control)
+        if placed_hours > best_hours:
+            best = placed
+
+    counts = {}
+    placements = []
+    for lesson, start, length, staff_id, room_id in best:
+        counts[lesson.subject_id] = counts.get(lesson.subject_id, 0) + length
+        for slot in range(start, start + length):
+            placements.append(
+                Placement(*search.occ.day_period(slot), lesson.subject_id, staff_id, room_id, lesson.class_key)
+            )
+    unplaced = {
+        l.subject_id: l.hours - counts.get(l.subject_id, 0)
+        for l in problem.lessons
+        if l.hours > counts.get(l.subject_id, 0)
+    }
+    return Result(
+        placements=placements,
+        unplaced=unplaced,
+        engine="csp",
+        seed=seed,
+        elapsed=time.perf_counter() - started,
+    )
@@ -0,0 +1,208 @@
+import os
+import threading
+import time
+
+import pymysql
+from flask import g, has_app_context
+
+# Database credentials from environment variables
+DB_HOST = os.getenv('DB_HOST', 'localhost')
+DB_USER = os.getenv('DB_USER', 'root')
+DB_PASSWORD = os.getenv('DB_PASSWORD', '')
+DB_NAME = os.getenv('DB_NAME', 'timetable_db4')
+
+# Connection pool of each web worker process
+POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', 5))
+# Idle connections older than this are closed instead of reused
+POOL_IDLE_SECONDS = float(os.getenv('DB_POOL_IDLE_SECONDS', 300))
+# A connection idle for longer than this is pinged before it is handed out
+POOL_PING_AFTER = float(os.getenv('DB_POOL_PING_AFTER', 1))
+# How long a request waits for a connection when the pool is at max size
+POOL_WAIT_SECONDS = float(os.getenv('DB_POOL_WAIT_SECONDS', 10))
+
+
+def connect():
+    """New, unpooled connection; the caller closes it"""
+    return pymysql.connect(
+        host=DB_HOST,
+        user=DB_USER,
+        password=DB_PASSWORD,
+        database=DB_NAME,
+        cursorclass=pymysql.cursors.DictCursor
+    )
+
+
+def in_clause(column, ids):
+    """SQL fragment matching column against any of ids; pass ids as the params"""
+    return f"{column} IN ({', '.join(['%s'] * len(ids))})"
+
+
+class PoolExhausted(pymysql.err.OperationalError):
+    """No connection became free within POOL_WAIT_SECONDS"""
+
+
+class ConnectionPool:
+    """
+    Bounded pool of open connections for one process.
+
+    Idle connections are reused last-in first-out, so the ones left over
+    after a burst age out and are closed by idle eviction. A connection that
+    has been idle for a while is pinged before it is handed out and replaced
+    if the server dropped it.
+    """
+
+    def __init__(self, max_size=POOL_MAX_SIZE, idle_seconds=POOL_IDLE_SECONDS,
+                 ping_after=POOL_PING_AFTER, wait_seconds=POOL_WAIT_SECONDS):
+        self.max_size = max_size
+        self.idle_seconds = idle_seconds
+        self.ping_after = ping_after
+        self.wait_seconds = wait_seconds
+        self.pid = os.getpid()
+        self._idle = []  # (connection, released at)
+        self._size = 0  # open connections, idle or in use
+        self._cond = threading.Condition()
+        self._stats = {"created": 0, "reused": 0, "waits": 0, "wait_seconds": 0.0, "evicted": 0, "broken": 0}
+
+    def _evict(self, now):
+        keep = []
+        for conn, released in self._idle:
+            if now - released > self.idle_seconds:
+                self._close(conn)
+                self._stats["evicted"] += 1
+            else:
+                keep.append((conn, released))
+        self._idle = keep
+
+    def _close(self, conn):
+        self._size -= 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _check_owner(self):
+        # A forked child sees the parent's pool object, but its sockets belong to the parent
+        if os.getpid() != self.pid:
+            raise RuntimeError(f"Connection pool of process {self.pid} used in process {os.getpid()}")
+
+    def acquire(self):
+        self._check_owner()
+        with self._cond:
+            now = time.monotonic()
+            self._evict(now)
+            waited = False
+            while not self._idle and self._size >= self.max_size:
+                if not waited:
+                    self._stats["waits"] += 1
+                    waited = True
+                remaining = self.wait_seconds - (time.monotonic() - now)
+                if remaining <= 0 or not self._cond.wait(remaining):
+                    if not self._idle and self._size >= self.max_size:
+                        raise PoolExhausted(f"No database connection free after {self.wait_seconds}s")
+            if waited:
+                self._stats["wait_seconds"] += time.monotonic() - now
+            if self._idle:
+                conn, released = self._idle.pop()
+            else:
+                conn, released = None, None
+                self._size += 1
+
+        if conn is not None and time.monotonic() - released > self.ping_after:
+            try:
+                conn.ping(reconnect=False)
+            except Exception:
+                with self._cond:
+                    self._stats["broken"] += 1
+                    self._close(conn)
+                    self._size += 1
+                conn = None
+        if conn is not None:
+            with self._cond:
+                self._stats["reused"] += 1
+            return conn
+
+        try:
+            conn = connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._stats["created"] += 1
+        return conn
+
+    def release(self, conn):
+        """Return conn to the pool, ending any transaction it still has open"""
+        self._check_owner()
+        try:
+            conn.rollback()
+        except Exception:
+            with self._cond:
+                self._stats["broken"] += 1
+                self._close(conn)
+                self._cond.notify()
+            return
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            return dict(
+                self._stats,
+                pid=self.pid,
+                size=self._size,
+                idle=len(self._idle),
+                in_use=self._size - len(self._idle),
+                max_size=self.max_size,
+            )
+
+
+_pool = None
+
+
+def get_pool():
+    """This process's pool; a forked worker never reuses its parent's sockets"""
+    global _pool
+    if _pool is None or _pool.pid != os.getpid():
+        _pool = ConnectionPool()
+    return _pool
+
+
+class _RequestConnection:
+    """The request's pooled connection; close() is left to the request teardown"""
+
+    def __init__(self, conn):
+        self._conn = conn
+        self.pid = os.getpid()
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def close(self):
+        pass
+
+
+def get_db_connection():
+    """
+    Inside a request: one pooled connection shared by every call until the
+    request ends. Elsewhere (jobs, scripts, streamed responses): a new
+    connection the caller closes.
+    """
+    if not has_app_context():
+        return connect()
+    conn = g.get("db")
+    if conn is not None and conn.pid != os.getpid():
+        # A process forked during a request inherits g; the request's socket stays with the parent
+        return connect()
+    if conn is None:
+        conn = g.db = _RequestConnection(get_pool().acquire())
+    return conn
+
+
+def release_db_connection(exc=None):
+    """teardown_appcontext handler giving the request's connection back to the pool"""
+    conn = g.pop("db", None)
+    if conn is not None and conn.pid == os.getpid():
+        get_pool().release(conn._conn)
@@ -0,0 +1,183 @@
+"""
+Split a Problem into independent components and solve them in parallel.
+
+Two classes interact only through staff who teach both, or through a room
+pool both draw from. Classes are joined when they share a staff member.
+Each room pool is then split into disjoint room sets, one per group using
+it, where every set keeps enough free rooms in every slot for all of its
+group's classes at once. Such a pool can never be the reason an hour does
+not fit. A pool that cannot be split that way joins all classes using it.
+
+The resulting sub-problems have no staff, classes or rooms in common, so
+they are solved in a process pool and their Results simply concatenate.
+"""
+import time
+from concurrent.futures import as_completed
+from dataclasses import replace
+
+from utils.control import UNLIMITED, RunControl
+from utils.occupancy import Occupancy
+from utils.parallel import WORKERS, process_pool
+from utils.problem import Result
+
+
+class _Groups:
+    """Union-find over class keys"""
+
+    def __init__(self, keys):
+        self.parent = {key: key for key in keys}
+
+    def find(self, key):
+        while self.parent[key] != key:
+            self.parent[key] = self.parent[self.parent[key]]
+            key = self.parent[key]
+        return key
+
+    def union(self, keys):
+        keys = list(keys)
+        for key in keys[1:]:
+            self.parent[self.find(key)] = self.find(keys[0])
+
+    def members(self):
+        groups = {}
+        for key in self.parent:
+            groups.setdefault(self.find(key), []).append(key)
+        return list(groups.values())
+
+
+def _split_pool(occ, room_type, needs):
+    """
+    Disjoint rooms of room_type's pool per group, given how many of the
+    group's classes use the type; None when some group would be short of a
+    room in some slot.
+    """
+    rooms = [room_id for room_id in occ.room_ids if occ.room_type[room_id] == room_type]
+    shares = {}
+    for group, classes in sorted(needs.items(), key=lambda item: -item[1]):
+        free = [0] * occ.n_slots
+        share = []
+        while min(free) < classes:
+            if not rooms:
+                return None
+            room_id = rooms.pop(0)
+            busy = occ.room.get(room_id, 0)
+            for s in range(occ.n_slots):
+                free[s] += not busy >> s & 1
+            share.append(room_id)
+        shares[group] = share
+    return shares
+
+
+def split(problem):
+    """Independent sub-problems of problem; a single one when nothing separates"""
+    occ = Occupancy.from_problem(problem)
+    # A type without rooms of its own falls back to every room, so nothing can be split
+    if any(lesson.room_type not in occ.pools for lesson in problem.lessons):
+        return [problem]
+
+    groups = _Groups(problem.classes)
+    by_staff = {}
+    for lesson in problem.lessons:
+        for staff_id in lesson.staff_ids:
+            by_staff.setdefault(staff_id, set()).add(lesson.class_key)
+    for classes in by_staff.values():
+        groups.union(classes)
+
+    # Joining the users of one pool can make another pool's split impossible, so repeat until stable
+    while True:
+        members = groups.members()
+        if len(members) == 1:
+            return [problem]
+        group_of = {key: i for i, keys in enumerate(members) for key in keys}
+        rooms_of = {i: [] for i in range(len(members))}
+        joined = False
+        for room_type in occ.pools:
+            users = {lesson.class_key for lesson in problem.lessons if lesson.room_type == room_type}
+            needs = {}
+            for key in users:
+                needs[group_of[key]] = needs.get(group_of[key], 0) + 1
+            shares = _split_pool(occ, room_type, needs)
+            if shares is None:
+                groups.union(users)
+                joined = True
+                break
+            for i, share in shares.items():
+                rooms_of[i].extend(share)
+        if not joined:
+            break
+
+    rooms = {room.id: room for room in problem.rooms}
+    parts = []
+    for i, keys in enumerate(members):
+        keys = set(keys)
+        lessons = [lesson for lesson in problem.lessons if lesson.class_key in keys]
+        staff_ids = {staff_id for lesson in lessons for staff_id in lesson.staff_ids}
+        parts.append(replace(
+            problem,
+            classes=[key for key in problem.classes if key in keys],
+            lessons=lessons,
+            rooms=[rooms[room_id] for room_id in rooms_of[i]],
+            staff_max_hours={s: h for s, h in problem.staff_max_hours.items() if s in staff_ids},
+        ))
+    return parts
+
+
+def _solve_part(solve, part, seed, deadline):
+    return solve(part, seed, RunControl(deadline=deadline))
+
+
+def solve_parts(parts, solve, seed=None, workers=WORKERS, control=UNLIMITED):
+    """
+    Merged Result of solve(part, seed, control) over independent parts,
+    solved in a process pool. Workers get the run's deadline; a cancelled run
+    stops handing out parts and reports the hours of the others unplaced.
+    """
+    started = time.perf_counter()
+    workers = max(1, min(workers, len(parts)))
+    results = {}
+
+    def progress():
+        control.report(
+            placed=sum(r.placed_count for r in results.values()),
+            unplaced=sum(r.unplaced_count for r in results.values()),
+            components=f"{len(results)}/{len(parts)}",
+        )
+
+    if workers > 1:
+        with process_pool(workers) as pool:
+            futures = {pool.submit(_solve_part, solve, part, seed, control.deadline): i for i, part in enumerate(parts)}
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+                progress()
+                if control.cancelled():
+                    for pending in futures:
+                        pending.cancel()
+                    break
+    else:
+        for i, part in enumerate(parts):
+            if control.cancelled():
+                break
+            results[i] = solve(part, seed, control)
+            progress()
+
+    placements = []
+    unplaced = {}
+    penalties = []
+    engine = ""
+    for i, part in enumerate(parts):
+        result = results.get(i)
+        if result is None:
+            unplaced.update((lesson.subject_id, lesson.hours) for lesson in part.lessons)
+            continue
+        placements.extend(result.placements)
+        unplaced.update(result.unplaced)
+        penalties.append(result.penalty)
+        engine = result.engine
+    return Result(
+        placements=placements,
+        unplaced=unplaced,
+        engine=f"{engine}+split{len(parts)}",
+        seed=seed,
+        elapsed=time.perf_counter() - started,
+        penalty=None if None in penalties else sum(penalties),
+    )
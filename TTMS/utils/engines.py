@@ -0,0 +1,136 @@
+"""
+Registry of timetable generation engines.
+
+Every engine is called as ``solve(problem, seed=None, control=UNLIMITED)``
+on a Problem and returns a Result, so routes, jobs and the CLI pick one by
+name and hand it to run_engine. Each entry carries a default wall-clock
+budget used when a request does not set one.
+
+The GAs in utils.generator work on their own dict model, so ``solve_ga`` and
+``solve_ga_islands`` wrap them: the problem's grid, bookings, classes, room
+types and blocks go into the encoding, then genes are kept in order while
+they satisfy every hard constraint (the GA does not know staff budgets or the
+subject day cap) and the rest are reported unplaced for the repair pass.
+"""
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+from utils import generator
+from utils.control import UNLIMITED
+from utils.csp import solve_csp
+from utils.occupancy import Occupancy
+from utils.problem import Placement, Result
+from utils.solver import solve_greedy
+
+
+@dataclass(frozen=True)
+class Engine:
+    name: str
+    label: str
+    solve: Callable
+    # Seconds a run may take when the request sets no time_budget
+    time_budget: float
+
+
+def _solve_genetic(problem, generate, name, seed, control):
+    """Run generate (a utils.generator entry point) on problem; hours it cannot place validly are left unplaced"""
+    started = time.perf_counter()
+    lessons = {lesson.subject_id: lesson for lesson in problem.lessons}
+    rooms = [room.id for room in problem.rooms]
+    subjects = [
+        {
+            "id": lesson.subject_id,
+            "weekly_hours": lesson.hours,
+            "class": lesson.class_key,
+            "block": lesson.block,
+            "rooms": [room.id for room in problem.rooms if room.room_type == lesson.room_type],
+        }
+        for lesson in problem.lessons
+    ]
+    staff_map = {lesson.subject_id: list(lesson.staff_ids) for lesson in problem.lessons}
+    bookings = [(b.day, b.period_no, b.staff_id, b.classroom_id) for b in problem.bookings]
+    hours = generate(
+        subjects, staff_map, rooms, seed=seed, control=control,
+        days=problem.days, periods=problem.period_nos, lunch_after=problem.lunch_after, bookings=bookings,
+    )
+    genes = {}
+    for hour in hours:
+        genes.setdefault(hour["gene"], []).append(hour)
+
+    occ = Occupancy.from_problem(problem)
+    day_counts = problem.booked_day_counts()
+
+    remaining = {subject_id: lesson.hours for subject_id, lesson in lessons.items()}
+    placements = []
+    for gene in genes.values():
+        first = gene[0]
+        lesson = lessons[first["subject_id"]]
+        length = len(gene)
+        slot = occ.slot(first["day"], first["period"])
+        staff_id = first["staff_id"]
+        if slot is None or remaining[lesson.subject_id] < length:
+            continue
+        d = slot // occ.n_periods
+        if day_counts[lesson.subject_id][d] + length > lesson.day_cap:
+            continue
+        if not occ.free_starts(staff_id, lesson.class_key, lesson.room_type, length) >> slot & 1:
+            continue
+        # Keep the GA's room when it is of the right type and free throughout
+        room_id = first["classroom_id"]
+        bit = occ.room_bit.get(room_id)
+        if (
+            bit is None or not occ.pool(lesson.room_type) >> bit & 1
+            or any(occ.slot_rooms[s] >> bit & 1 for s in range(slot, slot + length))
+        ):
+            room_id = occ.free_room(slot, lesson.room_type, length)
+        occ.book(slot, staff_id, room_id, lesson.class_key, length)
+        day_counts[lesson.subject_id][d] += length
+        remaining[lesson.subject_id] -= length
+        placements.extend(
+            Placement(hour["day"], hour["period"], lesson.subject_id, staff_id, room_id, lesson.class_key)
+            for hour in gene
+        )
+
+    return Result(
+        placements=placements,
+        unplaced={subject_id: hours for subject_id, hours in remaining.items() if hours > 0},
+        engine=name,
+        seed=seed,
+        elapsed=time.perf_counter() - started,
+    )
+
+
+def solve_ga(problem, seed=None, control=UNLIMITED):
+    """Single-population genetic algorithm"""
+    return _solve_genetic(problem, generator.generate_timetable, "ga", seed, control)
+
+
+def solve_ga_islands(problem, seed=None, control=UNLIMITED):
+    """Island-model genetic algorithm, its islands evolved in worker processes"""
+    return _solve_genetic(problem, generator.generate_timetable_islands, "ga-islands", seed, control)
+
+
+ENGINES = {
+    engine.name: engine
+    for engine in (
+        Engine("greedy", "Greedy", solve_greedy, time_budget=10.0),
+        Engine("csp", "Constraint search", solve_csp, time_budget=15.0),
+        Engine("ga", "Genetic algorithm", solve_ga, time_budget=20.0),
+        Engine("ga-islands", "Genetic algorithm (islands)", solve_ga_islands, time_budget=20.0),
+    )
+}
+DEFAULT_ENGINE = "greedy"
+
+
+def register(engine):
+    """Add an Engine, or replace the one registered under its name"""
+    ENGINES[engine.name] = engine
+
+
+def get_engine(name=None):
+    """Registered Engine called name (the default engine for None); raises ValueError"""
+    engine = ENGINES.get(name or DEFAULT_ENGINE)
+    if engine is None:
+        raise ValueError(f"Unknown generation engine: {name}")
+    return engine
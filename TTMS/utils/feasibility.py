@@ -0,0 +1,144 @@
+"""
+Pre-solve feasibility check on a loaded Problem.
+
+Counting bounds that any complete timetable has to satisfy, checked in a few
+milliseconds before an engine is started:
+
+- a subject cannot get more hours than the week holds under its day cap;
+- a class cannot take more hours than there are slots with a free room;
+- Hall's condition for staff: the subjects that only a set of staff can
+  teach need no more hours than those staff have free slots and max_hours
+  left. It is checked for every subject's staff set and for each group of
+  staff linked by shared subjects;
+- a room type cannot host more hours than its free room-periods, and one
+  class cannot use more of them than the slots where a room of the type is
+  free.
+
+A failed check means some hours cannot be placed whatever the engine does.
+"""
+from utils.occupancy import Occupancy
+
+
+class Infeasible(ValueError):
+    """The problem cannot be fully placed; issues explains why"""
+
+    def __init__(self, issues):
+        self.issues = issues
+        super().__init__("Timetable cannot be fully generated: " + "; ".join(issues))
+
+
+def _class_name(class_key):
+    return "/".join(str(v) for v in class_key)
+
+
+def _staff_groups(lessons):
+    """Sets of staff connected through subjects they can both teach"""
+    groups = []
+    for lesson in lessons:
+        merged = set(lesson.staff_ids)
+        rest = []
+        for group in groups:
+            if group & merged:
+                merged |= group
+            else:
+                rest.append(group)
+        groups = rest + [merged]
+    return [frozenset(g) for g in groups]
+
+
+def diagnose(problem):
+    """List of human readable reasons the problem cannot be fully placed; empty if none found"""
+    occ = Occupancy.from_problem(problem)
+    n_days = len(problem.days)
+    usable = ~occ.rooms_full & occ.full
+    issues = []
+
+    for lesson in problem.lessons:
+        cap = n_days * lesson.day_cap
+        if lesson.hours > cap:
+            issues.append(
+                f"subject {lesson.subject_id} of class {_class_name(lesson.class_key)} needs "
+                f"{lesson.hours} hours but at most {cap} fit in a week ({lesson.day_cap} per day)"
+            )
+
+    class_hours = {}
+    for lesson in problem.lessons:
+        class_hours[lesson.class_key] = class_hours.get(lesson.class_key, 0) + lesson.hours
+    slots = usable.bit_count()
+    for class_key, hours in class_hours.items():
+        if hours > slots:
+            issues.append(
+                f"class {_class_name(class_key)} needs {hours} hours but only {slots} periods have a free room"
+            )
+
+    # Staff: free periods, capped by what is left of max_hours after other classes
+    booked = {}
+    for b in problem.bookings:
+        booked[b.staff_id] = booked.get(b.staff_id, 0) + 1
+    available = {}
+    for lesson in problem.lessons:
+        for staff_id in lesson.staff_ids:
+            if staff_id in available:
+                continue
+            free = (usable & ~occ.staff.get(staff_id, 0)).bit_count()
+            available[staff_id] = min(free, max(0, occ.budget_left(staff_id)))
+
+    candidates = {frozenset(lesson.staff_ids) for lesson in problem.lessons}
+    candidates.update(_staff_groups(problem.lessons))
+    failed = []
+    for staff_set in sorted(candidates, key=lambda s: (len(s), sorted(s))):
+        if any(f <= staff_set for f in failed):
+            continue
+        subjects = [l for l in problem.lessons if set(l.staff_ids) <= staff_set]
+        need = sum(l.hours for l in subjects)
+        have = sum(available[s] for s in staff_set)
+        if need <= have:
+            continue
+        failed.append(staff_set)
+        ids = ", ".join(str(s) for s in sorted(staff_set))
+        subject_ids = ", ".join(str(l.subject_id) for l in subjects)
+        if len(staff_set) == 1:
+            (staff_id,) = staff_set
+            limit = problem.staff_max_hours.get(staff_id)
+            detail = f"max_hours {limit}, " if limit is not None else ""
+            issues.append(
+                f"staff {ids} must teach {need} hours (subjects {subject_ids}) but has only {have} available "
+                f"({detail}{booked.get(staff_id, 0)} already booked in other classes)"
+            )
+        else:
+            issues.append(
+                f"staff {ids} together must teach {need} hours (subjects {subject_ids}) "
+                f"but have only {have} available"
+            )
+
+    # Room types; a type the institution has no room of falls back to any room
+    for room_type, pool in occ.pools.items():
+        lessons = [l for l in problem.lessons if l.room_type == room_type]
+        if not lessons:
+            continue
+        free_by_slot = [(pool & ~occ.slot_rooms[s]).bit_count() for s in range(occ.n_slots)]
+        room_periods = sum(free_by_slot)
+        need = sum(l.hours for l in lessons)
+        if need > room_periods:
+            issues.append(
+                f"{room_type} rooms: {need} hours needed but only {room_periods} room-periods are free "
+                f"({pool.bit_count()} rooms)"
+            )
+        type_slots = sum(1 for n in free_by_slot if n)
+        per_class = {}
+        for l in lessons:
+            per_class[l.class_key] = per_class.get(l.class_key, 0) + l.hours
+        for class_key, hours in per_class.items():
+            if hours > type_slots and type_slots < slots:
+                issues.append(
+                    f"class {_class_name(class_key)} needs {hours} {room_type} hours but a "
+                    f"{room_type} room is free in only {type_slots} periods"
+                )
+    return issues
+
+
+def check(problem):
+    """Raise Infeasible when diagnose finds a problem"""
+    issues = diagnose(problem)
+    if issues:
+        raise Infeasible(issues)
@@ -1,5 +1,9 @@
-import random
-import copy
+import os
+
+import numpy as np
+
+from utils.control import UNLIMITED
+from utils.parallel import process_pool
 
 DAYS = ["Monday","Tuesday","Wednesday","Thursday","Friday"]
 PERIODS = [1,2,3,4,5,6,7]
@@ -7,22 +11,278 @@ PERIODS = [1,2,3,4,5,6,7]
 POP = 20
 GEN = 50
 MUT = 0.1
+# Single-gene moves tried on the winner after the last generation
+LOCAL_STEPS = 2000
+
+# Island model: populations, worker processes, and how often / how many
+# of the best individuals move to the next island
+ISLANDS = 4
+WORKERS = int(os.getenv("GA_WORKERS", os.cpu_count() or 1))
+MIGRATION_INTERVAL = 10
+MIGRANTS = 2
+
+# Gene columns of a population array (individual x gene x column)
+DAY, PERIOD, STAFF, ROOM = range(4)
+
+# Every gene column is a small index, so one fixed-width uint16 row per gene
+# (8 bytes) is enough for the whole chromosome
+CHROMOSOME_DTYPE = np.uint16
+
+
+def _options(lists):
+    """Ragged per-gene option lists padded to a rectangle, with their lengths, for vectorised sampling"""
+    width = max((len(x) for x in lists), default=1)
+    options = np.zeros((len(lists), width), dtype=CHROMOSOME_DTYPE)
+    counts = np.ones(len(lists), dtype=np.int64)
+    for g, values in enumerate(lists):
+        options[g, :len(values)] = values
+        counts[g] = len(values)
+    return options, counts
+
 
-def random_tt(subjects, staff_map, rooms):
-    tt = []
+def _pick(options, counts, genes, rng):
+    """One random option for each gene index in genes (any shape)"""
+    return options[genes, (rng.random(genes.shape) * counts[genes]).astype(np.int64)]
+
+
+def encode(subjects, staff_map, rooms, days=DAYS, periods=PERIODS, lunch_after=None, bookings=()):
+    """
+    Fixed gene layout shared by every individual: one gene per subject hour,
+    or per block for subjects with a "block" length, starting only where the
+    block fits in the day without straddling lunch_after. Subjects may name
+    their "class" (genes of one class must not share a slot) and the "rooms"
+    they can use (all rooms by default).
+
+    Staff, rooms and classes are interned so genes hold small indexes, not DB
+    ids. bookings are (day, period, staff_id, room_id) rows already in the
+    timetable; a gene on one of their staff or room slots counts as a clash.
+    """
+    staff_ids = sorted({s for sub in subjects for s in staff_map.get(sub["id"], [])})
+    if max(len(staff_ids), len(rooms)) > np.iinfo(CHROMOSOME_DTYPE).max:
+        raise ValueError("Too many staff or rooms for the chromosome encoding")
+    staff_index = {s: i for i, s in enumerate(staff_ids)}
+    room_index = {r: i for i, r in enumerate(rooms)}
+    class_index = {}
+    n_periods = len(periods)
+    starts = {}
+
+    gene_subjects, gene_staff, gene_rooms, gene_periods, lengths, gene_class = [], [], [], [], [], []
     for s in subjects:
+        staffs = [staff_index[x] for x in staff_map.get(s["id"], [])]
+        if not staffs:
+            continue
+        room_options = [room_index[r] for r in s.get("rooms") or () if r in room_index] or list(range(len(rooms)))
+        klass = class_index.setdefault(s.get("class"), len(class_index))
         hours = s["weekly_hours"]
-        staffs = staff_map.get(s["id"], [])
-        while hours > 0 and staffs:
-            tt.append({
-                "day": random.choice(DAYS),
-                "period": random.choice(PERIODS),
-                "subject_id": s["id"],
-                "staff_id": random.choice(staffs),
-                "classroom_id": random.choice(rooms)
-            })
-            hours -= 1
-    return tt
+        while hours > 0:
+            length = min(s.get("block", 1), hours)
+            hours -= length
+            if length not in starts:
+                starts[length] = [
+                    p for p in range(n_periods - length + 1) if lunch_after not in periods[p:p + length - 1]
+                ]
+            if not starts[length]:
+                continue
+            gene_subjects.append(s["id"])
+            gene_staff.append(staffs)
+            gene_rooms.append(room_options)
+            gene_periods.append(starts[length])
+            lengths.append(length)
+            gene_class.append(klass)
+
+    # A gene of length L covers L cells: its start period and the L - 1 after it
+    widths = np.array(lengths, dtype=np.int64)
+    cell_gene = np.repeat(np.arange(len(widths)), widths)
+    cell_offset = np.arange(len(cell_gene)) - np.repeat(np.cumsum(widths) - widths, widths)
+
+    n_staff = max(len(staff_ids), 1)
+    n_rooms = max(len(rooms), 1)
+    day_index = {day: d for d, day in enumerate(days)}
+    period_index = {p: i for i, p in enumerate(periods)}
+    booked_staff, booked_room = [], []
+    for day, period, staff_id, room_id in bookings:
+        if day not in day_index or period not in period_index:
+            continue
+        slot = day_index[day] * n_periods + period_index[period]
+        if staff_id in staff_index:
+            booked_staff.append(slot * n_staff + staff_index[staff_id])
+        if room_id in room_index:
+            booked_room.append(slot * n_rooms + room_index[room_id])
+
+    staff_options, staff_counts = _options(gene_staff)
+    room_options, room_counts = _options(gene_rooms)
+    period_options, period_counts = _options(gene_periods)
+    return {
+        "subjects": gene_subjects,
+        "staff_ids": staff_ids,
+        "room_ids": list(rooms),
+        "days": list(days),
+        "periods": list(periods),
+        "n_staff": n_staff,
+        "n_rooms": n_rooms,
+        "n_classes": max(len(class_index), 1),
+        "staff_options": staff_options,
+        "staff_counts": staff_counts,
+        "room_options": room_options,
+        "room_counts": room_counts,
+        "period_options": period_options,
+        "period_counts": period_counts,
+        "lengths": lengths,
+        "gene_class": gene_class,
+        "cell_gene": cell_gene,
+        "cell_offset": cell_offset,
+        "cell_class": np.array(gene_class, dtype=np.int64)[cell_gene],
+        "booked_staff": np.unique(np.array(booked_staff, dtype=np.int64)),
+        "booked_room": np.unique(np.array(booked_room, dtype=np.int64)),
+    }
+
+
+def random_population(layout, size, rng):
+    genes = len(layout["subjects"])
+    index = np.broadcast_to(np.arange(genes), (size, genes))
+    pop = np.empty((size, genes, 4), dtype=CHROMOSOME_DTYPE)
+    pop[:, :, DAY] = rng.integers(0, len(layout["days"]), (size, genes))
+    pop[:, :, PERIOD] = _pick(layout["period_options"], layout["period_counts"], index, rng)
+    pop[:, :, STAFF] = _pick(layout["staff_options"], layout["staff_counts"], index, rng)
+    pop[:, :, ROOM] = _pick(layout["room_options"], layout["room_counts"], index, rng)
+    return pop
+
+
+def _collisions(keys, fixed=None):
+    """Per row, how many entries repeat an earlier entry of the same row or one of the unique fixed keys"""
+    if fixed is not None and len(fixed):
+        keys = np.concatenate([np.broadcast_to(fixed, (keys.shape[0], len(fixed))), keys], axis=1)
+    keys = np.sort(keys, axis=1)
+    return (keys[:, 1:] == keys[:, :-1]).sum(axis=1)
+
+
+def population_fitness(pop, layout):
+    """Batched fitness: 1000 minus 50 per staff, room or class double booking, bookings included"""
+    if pop.shape[1] == 0:
+        return np.full(pop.shape[0], 1000, dtype=np.int64)
+    cells = layout["cell_gene"]
+    # Widen before encoding keys; the chromosome columns are only uint16
+    start = pop[:, :, DAY].astype(np.int64) * len(layout["periods"]) + pop[:, :, PERIOD]
+    slot = start[:, cells] + layout["cell_offset"]
+    staff_clash = _collisions(slot * layout["n_staff"] + pop[:, cells, STAFF], layout["booked_staff"])
+    room_clash = _collisions(slot * layout["n_rooms"] + pop[:, cells, ROOM], layout["booked_room"])
+    class_clash = _collisions(slot * layout["n_classes"] + layout["cell_class"])
+    return 1000 - 50 * (staff_clash + room_clash + class_clash)
+
+
+def decode(layout, individual):
+    """
+    Materialise one individual in the dict form used by the rest of the app:
+    one dict per hour, tagged with the index of the gene (block) it belongs to
+    """
+    days, periods = layout["days"], layout["periods"]
+    return [
+        {
+            "day": days[day],
+            "period": periods[period + k],
+            "subject_id": layout["subjects"][g],
+            "staff_id": layout["staff_ids"][staff],
+            "classroom_id": layout["room_ids"][room],
+            "gene": g,
+        }
+        for g, (day, period, staff, room) in enumerate(individual.tolist())
+        for k in range(layout["lengths"][g])
+    ]
+
+
+class ConflictCounter:
+    """
+    Per-slot staff, room and class counters for one individual, with the
+    bookings' staff and room slots counted in from the start.
+
+    Moving a gene to another slot only touches the counters of its cells, so
+    the score change of a move is known without rescanning the timetable.
+    """
+
+    def __init__(self, individual, layout):
+        self.genes = individual.tolist()
+        self.lengths = layout["lengths"]
+        self.n_periods = len(layout["periods"])
+        self.n_staff = layout["n_staff"]
+        self.n_rooms = layout["n_rooms"]
+        self.n_classes = layout["n_classes"]
+        self.gene_class = layout["gene_class"]
+        n_slots = len(layout["days"]) * self.n_periods
+        self.staff = [0] * (n_slots * self.n_staff)
+        self.room = [0] * (n_slots * self.n_rooms)
+        self.klass = [0] * (n_slots * self.n_classes)
+        for key in layout["booked_staff"].tolist():
+            self.staff[key] = 1
+        for key in layout["booked_room"].tolist():
+            self.room[key] = 1
+        self.clashes = 0
+        for g in range(len(self.genes)):
+            self._add(g)
+
+    @property
+    def score(self):
+        return 1000 - 50 * self.clashes
+
+    def _cells(self, g):
+        """(staff, room, class) counter indexes of every cell of gene g"""
+        day, period, staff, room = self.genes[g]
+        start = day * self.n_periods + period
+        return [
+            (slot * self.n_staff + staff, slot * self.n_rooms + room, slot * self.n_classes + self.gene_class[g])
+            for slot in range(start, start + self.lengths[g])
+        ]
+
+    def _add(self, g):
+        for s, r, c in self._cells(g):
+            self.clashes += (self.staff[s] > 0) + (self.room[r] > 0) + (self.klass[c] > 0)
+            self.staff[s] += 1
+            self.room[r] += 1
+            self.klass[c] += 1
+
+    def _remove(self, g):
+        for s, r, c in self._cells(g):
+            self.staff[s] -= 1
+            self.room[r] -= 1
+            self.klass[c] -= 1
+            self.clashes -= (self.staff[s] > 0) + (self.room[r] > 0) + (self.klass[c] > 0)
+
+    def in_conflict(self, g):
+        return any(self.staff[s] > 1 or self.room[r] > 1 or self.klass[c] > 1 for s, r, c in self._cells(g))
+
+    def delta(self, g, day, period):
+        """Score change if gene g moved to (day, period)"""
+        old_day, old_period = self.genes[g][DAY], self.genes[g][PERIOD]
+        if (old_day, old_period) == (day, period):
+            return 0
+        clashes = self.clashes
+        self.move(g, day, period)
+        change = self.clashes - clashes
+        self.move(g, old_day, old_period)
+        return -50 * change
+
+    def move(self, g, day, period):
+        self._remove(g)
+        self.genes[g][DAY] = day
+        self.genes[g][PERIOD] = period
+        self._add(g)
+
+
+def local_search(individual, layout, rng, steps=LOCAL_STEPS):
+    """Move clashing genes to random slots, keeping every move that does not lose score"""
+    counter = ConflictCounter(individual, layout)
+    genes = len(counter.genes)
+    if not genes:
+        return individual, counter.score
+    picks = rng.integers(0, genes, steps)
+    days = rng.integers(0, len(layout["days"]), steps).tolist()
+    periods = _pick(layout["period_options"], layout["period_counts"], picks, rng).tolist()
+    for g, day, period in zip(picks.tolist(), days, periods):
+        if not counter.clashes:
+            break
+        if counter.in_conflict(g) and counter.delta(g, day, period) >= 0:
+            counter.move(g, day, period)
+    return np.array(counter.genes, dtype=individual.dtype), counter.score
+
 
 def fitness(tt):
     score = 1000
@@ -38,22 +298,138 @@ def fitness(tt):
         room_slots.add(r)
     return score
 
-def generate_timetable(subjects, staff_map, rooms):
-    population = [random_tt(subjects, staff_map, rooms) for _ in range(POP)]
-
-    for _ in range(GEN):
-        population.sort(key=fitness, reverse=True)
-        next_gen = population[:POP//2]
-        while len(next_gen) < POP:
-            p1, p2 = random.sample(next_gen, 2)
-            cut = len(p1)//2
-            child = copy.deepcopy(p1[:cut] + p2[cut:])
-            if random.random() < MUT and child:
-                c = random.choice(child)
-                c["day"] = random.choice(DAYS)
-                c["period"] = random.choice(PERIODS)
-            next_gen.append(child)
-        population = next_gen
-
-    population.sort(key=fitness, reverse=True)
-    return population[0]
\ No newline at end of file
+
+def evolve(population, scores, generations, rng, layout, control=UNLIMITED):
+    """
+    Run generations of selection, crossover and mutation; returns (population, scores).
+    Stops early, with the population evolved so far, once control is stopped.
+    """
+    size, genes = population.shape[:2]
+    elite = size // 2
+    cut = genes // 2
+    n_children = size - elite
+
+    # Two preallocated buffers swapped every generation: survivors and
+    # children are slice-copied into the spare one, nothing else is allocated
+    spare = np.empty_like(population)
+    spare_scores = np.empty_like(scores)
+
+    for generation in range(generations):
+        if control.stopped():
+            break
+        control.report(generation=generation, score=int(scores.max()))
+        order = np.argsort(-scores, kind="stable")[:elite]
+        parents = spare[:elite]
+        children = spare[elite:]
+        np.take(population, order, axis=0, out=parents)
+        np.take(scores, order, out=spare_scores[:elite])
+
+        # Two distinct parents per child, one-point crossover at the middle
+        p1 = rng.integers(0, elite, n_children)
+        p2 = (p1 + rng.integers(1, elite, n_children)) % elite
+        np.take(parents[:, :cut], p1, axis=0, out=children[:, :cut])
+        np.take(parents[:, cut:], p2, axis=0, out=children[:, cut:])
+
+        mutate = np.flatnonzero(rng.random(n_children) < MUT)
+        if genes and len(mutate):
+            g = rng.integers(0, genes, len(mutate))
+            children[mutate, g, DAY] = rng.integers(0, len(layout["days"]), len(mutate))
+            children[mutate, g, PERIOD] = _pick(layout["period_options"], layout["period_counts"], g, rng)
+
+        # Scores are computed once per individual and carried along with survivors
+        spare_scores[elite:] = population_fitness(children, layout)
+        population, spare = spare, population
+        scores, spare_scores = spare_scores, scores
+
+    return population, scores
+
+
+def generate_timetable(subjects, staff_map, rooms, seed=None, control=UNLIMITED, **grid):
+    """Single-population GA; grid (days, periods, lunch_after, bookings) is passed to encode"""
+    rng = np.random.default_rng(seed)
+    layout = encode(subjects, staff_map, rooms, **grid)
+
+    population = random_population(layout, POP, rng)
+    scores = population_fitness(population, layout)
+    population, scores = evolve(population, scores, GEN, rng, layout, control)
+
+    best = int(np.argmax(scores))
+    winner, _ = local_search(population[best], layout, rng)
+    # Only the winner is ever turned back into dicts
+    return decode(layout, winner)
+
+
+# -------- ISLAND MODEL --------
+# Problem data of the current worker process, set once by _init_island
+_island = {}
+
+
+def _init_island(layout):
+    _island.update(layout=layout)
+
+
+def _island_epoch(state, generations, seed):
+    """Evolve one island for an epoch; state is None for a fresh island"""
+    rng = np.random.default_rng(seed)
+    layout = _island["layout"]
+    if state is None:
+        population = random_population(layout, POP, rng)
+        state = population, population_fitness(population, layout)
+    return evolve(state[0], state[1], generations, rng, layout)
+
+
+def _migrate(states):
+    """Ring migration: each island's best replace the next island's worst"""
+    migrants = []
+    for population, scores in states:
+        top = np.argsort(-scores, kind="stable")[:MIGRANTS]
+        migrants.append((population[top].copy(), scores[top].copy()))
+    for i, (population, scores) in enumerate(states):
+        incoming, incoming_scores = migrants[i - 1]
+        worst = np.argsort(scores, kind="stable")[:len(incoming)]
+        population[worst] = incoming
+        scores[worst] = incoming_scores
+
+
+def generate_timetable_islands(subjects, staff_map, rooms, islands=ISLANDS, workers=WORKERS, seed=None,
+                               control=UNLIMITED, **grid):
+    """
+    Island-model GA: independent populations evolved in a process pool,
+    exchanging their best individuals every MIGRATION_INTERVAL generations.
+    control is checked between epochs; once stopped the best island so far wins.
+    grid is passed to encode, as for generate_timetable.
+    """
+    layout = encode(subjects, staff_map, rooms, **grid)
+    *island_seeds, polish_seed = np.random.SeedSequence(seed).spawn(islands + 1)
+    workers = max(1, min(workers, islands))
+
+    pool = None
+    if workers > 1:
+        # Problem data is handed to each worker once, only populations travel per epoch
+        pool = process_pool(workers, initializer=_init_island, initargs=(layout,))
+    else:
+        _init_island(layout)
+
+    try:
+        states = [None] * islands
+        done = 0
+        while done < GEN and not (done and control.stopped()):
+            generations = min(MIGRATION_INTERVAL, GEN - done)
+            epoch_seeds = [island_seed.spawn(1)[0] for island_seed in island_seeds]
+            if pool:
+                futures = [pool.submit(_island_epoch, states[i], generations, epoch_seeds[i]) for i in range(islands)]
+                states = [f.result() for f in futures]
+            else:
+                states = [_island_epoch(states[i], generations, epoch_seeds[i]) for i in range(islands)]
+            done += generations
+            control.report(generation=done, score=int(max(state[1].max() for state in states)))
+            if done < GEN and islands > 1:
+                _migrate(states)
+    finally:
+        if pool:
+            pool.shutdown()
+
+    population, scores = max(states, key=lambda state: state[1].max())
+    best = int(np.argmax(scores))
+    winner, _ = local_search(population[best], layout, np.random.default_rng(polish_seed))
+    return decode(layout, winner)
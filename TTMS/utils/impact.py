@@ -0,0 +1,206 @@
+"""
+Change-impact analysis and incremental repair after staff or subject edits.
+
+Instead of regenerating whole timetables, an edit route asks which classes
+depend on the staff or subjects it is about to change (``affected_classes``,
+called before the edit), applies the edit, and then lets ``repair_classes``
+drop exactly the rows the edit invalidated and place the hours that are now
+missing. Every row that is still valid stays where it is.
+"""
+from dataclasses import dataclass, field
+from typing import List
+
+from utils.db import in_clause
+from utils.occupancy import Occupancy
+from utils.problem import ClassKey, Result
+from utils.repair import repair_unplaced
+from utils.snapshot import insert_placements, load_placements, load_snapshot, load_unstaffed
+from utils.workload import delete_timetable
+
+
+@dataclass
+class Impact:
+    classes: List[ClassKey]
+    # Timetable row ids that were deleted as invalid
+    removed: List[int]
+    # New placements only; untouched rows are not included
+    result: Result
+    # Subjects left with no qualified staff ({"id", "code", "hours"}); none of their hours can be placed
+    unstaffed: List[dict] = field(default_factory=list)
+
+    def summary(self):
+        return {
+            "classes": ["/".join(str(v) for v in key) for key in self.classes],
+            "removed": len(self.removed),
+            "placed": self.result.placed_count,
+            "unplaced": self.result.unplaced_count + sum(s["hours"] for s in self.unstaffed),
+            "unstaffed": self.unstaffed,
+        }
+
+
+def affected_classes(cur, staff_ids=(), subject_ids=()):
+    """
+    Classes whose timetables depend on any of the given staff or subjects:
+    every class the staff teach in (across all courses) and every class the
+    subjects belong to. Call it before the edit, while the rows still exist.
+    """
+    staff_ids, subject_ids = list(staff_ids), list(subject_ids)
+    queries, params = [], []
+    timetable_where = []
+    if staff_ids:
+        timetable_where.append(in_clause("staff_id", staff_ids))
+        params += staff_ids
+    if subject_ids:
+        timetable_where.append(in_clause("subject_id", subject_ids))
+        params += subject_ids
+    if not timetable_where:
+        return []
+    queries.append(f"SELECT year, course_id, semester FROM timetable WHERE {' OR '.join(timetable_where)}")
+    if subject_ids:
+        queries.append(f"SELECT year, course_id, semester FROM subjects WHERE {in_clause('id', subject_ids)}")
+        params += subject_ids
+
+    cur.execute(" UNION ".join(queries), params)
+    return sorted({(r["year"], int(r["course_id"]), r["semester"]) for r in cur.fetchall()})
+
+
+def _units(occ, lesson, rows, leftover_free):
+    """
+    Cut one day's rows of a block lesson into legal units: runs of
+    consecutive periods with one staff member and room, split into whole
+    blocks starting where a block may start, plus at most one shorter unit
+    for hours not a multiple of the block. Returns (units, rows left over, leftover_free).
+    """
+    rows = sorted(rows, key=lambda r: r[0])
+    leftover = lesson.hours % lesson.block
+    units, loose = [], []
+    i = 0
+    while i < len(rows):
+        # Extent of the run starting at i
+        j = i + 1
+        while (
+            j < len(rows)
+            and rows[j][0] == rows[j - 1][0] + 1
+            and rows[j][2].staff_id == rows[i][2].staff_id
+            and rows[j][2].classroom_id == rows[i][2].classroom_id
+        ):
+            j += 1
+        k = i
+        while k < j:
+            slot = rows[k][0]
+            if j - k >= lesson.block and occ.block_starts(lesson.block) >> slot & 1:
+                length = lesson.block
+            elif leftover_free and leftover and j - k >= leftover and occ.block_starts(leftover) >> slot & 1:
+                length = leftover
+                leftover_free = False
+            else:
+                loose.append(rows[k])
+                k += 1
+                continue
+            units.append(rows[k:k + length])
+            k += length
+        i = j
+    return units, loose, leftover_free
+
+
+def find_stale(problem, rows):
+    """
+    Split saved (row id, Placement) rows of the problem's classes into ids of
+    rows the current data no longer allows and the placements that stay.
+
+    A row is stale when its subject is gone or has no staff, its staff member
+    no longer teaches the subject, its period is gone, its room is not of the
+    subject's room type, it is beyond the subject's weekly hours or daily
+    cap or its staff member's max_hours budget (hours booked in other
+    classes count first, then later rows of the week go first), or, for a
+    block lesson, it is not part of a legal block (e.g. single hours left
+    after block_length grew).
+    """
+    lessons = {lesson.subject_id: lesson for lesson in problem.lessons}
+    room_types = {room.id: room.room_type for room in problem.rooms}
+    occ = Occupancy(problem.days, problem.period_nos, [], problem.lunch_after)
+
+    stale = []
+    # (subject_id, day index) -> [(slot, row id, Placement)] of rows valid on their own
+    by_day = {}
+    for row_id, p in rows:
+        lesson = lessons.get(p.subject_id)
+        slot = occ.slot(p.day, p.period_no)
+        if (
+            lesson is None
+            or lesson.class_key != p.class_key
+            or p.staff_id not in lesson.staff_ids
+            or slot is None
+            or (lesson.room_type in room_types.values() and room_types.get(p.classroom_id) != lesson.room_type)
+        ):
+            stale.append(row_id)
+            continue
+        by_day.setdefault((p.subject_id, slot // occ.n_periods), []).append((slot, row_id, p))
+
+    # Units of consecutive rows that are placed or dropped together: single rows, or whole blocks
+    units = []
+    leftover_free = {}
+    for (subject_id, d), day_rows in sorted(by_day.items(), key=lambda item: item[0][1]):
+        lesson = lessons[subject_id]
+        if lesson.block == 1:
+            units.extend([row] for row in day_rows)
+            continue
+        day_units, loose, leftover_free[subject_id] = _units(
+            occ, lesson, day_rows, leftover_free.get(subject_id, True)
+        )
+        units.extend(day_units)
+        stale.extend(row_id for _, row_id, _ in loose)
+    units.sort(key=lambda unit: (unit[0][0], unit[0][1]))
+
+    hours = {}
+    day_counts = {}
+    # Staff hours towards max_hours, starting from what other classes already book
+    staff_hours = {}
+    for b in problem.bookings:
+        staff_hours[b.staff_id] = staff_hours.get(b.staff_id, 0) + 1
+    kept = []
+    for unit in units:
+        slot, _, p = unit[0]
+        lesson = lessons[p.subject_id]
+        day = (p.subject_id, slot // occ.n_periods)
+        max_hours = problem.staff_max_hours.get(p.staff_id)
+        if (
+            hours.get(p.subject_id, 0) + len(unit) > lesson.hours
+            or day_counts.get(day, 0) + len(unit) > lesson.day_cap
+            or (max_hours is not None and staff_hours.get(p.staff_id, 0) + len(unit) > max_hours)
+        ):
+            stale.extend(row_id for _, row_id, _ in unit)
+            continue
+        hours[p.subject_id] = hours.get(p.subject_id, 0) + len(unit)
+        day_counts[day] = day_counts.get(day, 0) + len(unit)
+        staff_hours[p.staff_id] = staff_hours.get(p.staff_id, 0) + len(unit)
+        kept.extend(p for _, _, p in unit)
+    return stale, kept
+
+
+def repair_classes(cur, classes, seed=None):
+    """
+    Delete the stale rows of the given classes and place their missing hours
+    around everything else; runs on the caller's transaction.
+    """
+    if not classes:
+        return Impact(classes=[], removed=[], result=Result([], engine="incremental", seed=seed))
+    problem = load_snapshot(cur, classes)
+    stale, kept = find_stale(problem, load_placements(cur, classes))
+
+    placed = {}
+    for p in kept:
+        placed[p.subject_id] = placed.get(p.subject_id, 0) + 1
+    missing = {
+        lesson.subject_id: lesson.hours - placed.get(lesson.subject_id, 0)
+        for lesson in problem.lessons
+        if lesson.hours > placed.get(lesson.subject_id, 0)
+    }
+    result = repair_unplaced(
+        problem, Result([], unplaced=missing, engine="incremental", seed=seed), seed=seed, pinned=kept
+    )
+
+    if stale:
+        delete_timetable(cur, in_clause("t.id", stale), stale)
+    insert_placements(cur, problem, result.placements)
+    return Impact(classes=problem.classes, removed=stale, result=result, unstaffed=load_unstaffed(cur, classes))
@@ -0,0 +1,280 @@
+"""
+Asynchronous generation jobs.
+
+A job is a row in ``generation_jobs``; the web request only inserts it and
+hands the id to a local process pool, so gunicorn workers are never blocked
+by a long solve. The pool process claims the row, runs load -> solve -> save
+on its own connection and records state, progress, counts and timings as it
+goes. Any web worker can then report on the job from the table.
+
+While the engine runs, its progress (placed hours, best score, elapsed
+seconds) is written to the row, and a cancel request on the row stops the
+run; a cancelled job saves nothing.
+
+The pool starts its processes with ``spawn``, so they inherit nothing from
+the request that created it. Each web worker stamps ``heartbeat_at`` on the
+queued and running jobs it submitted; when a worker dies or restarts its
+jobs stop beating, and ``recover_jobs`` (run by every worker's heartbeat and
+by the status route) marks them failed. A job process that dies outright
+fails its job at once.
+"""
+import json
+import os
+import threading
+import time
+import traceback
+from concurrent.futures.process import BrokenProcessPool
+
+from utils.control import RunControl
+from utils.db import connect, in_clause
+from utils.parallel import process_pool
+from utils.pipeline import run_engine
+from utils.snapshot import load_classes, load_snapshot, save_result
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))
+# Seconds between two reads of a running job's cancel flag
+CANCEL_POLL_SECONDS = 1.0
+# Seconds between heartbeats of a worker's jobs; a job unstamped for JOB_STALE_SECONDS has lost its worker
+HEARTBEAT_SECONDS = 15
+JOB_STALE_SECONDS = 60
+
+FINAL_STATES = ("done", "failed", "cancelled")
+
+# Per gunicorn worker: its pool, and the ids of its jobs that have not finished
+_pool = None
+_pool_pid = None
+_active = set()
+_active_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool, _pool_pid
+    if _pool_pid != os.getpid():
+        _pool, _pool_pid = None, os.getpid()
+        _active.clear()
+        threading.Thread(target=_heartbeat, name="job-heartbeat", daemon=True).start()
+    if _pool is None:
+        _pool = process_pool(JOB_WORKERS)
+    return _pool
+
+
+def create_job(cur, scope, params):
+    """Insert a queued job; params must be JSON serialisable"""
+    cur.execute(
+        "INSERT INTO generation_jobs (scope, params) VALUES (%s, %s)",
+        (scope, json.dumps(params))
+    )
+    return cur.lastrowid
+
+
+def get_job(cur, job_id):
+    cur.execute("SELECT * FROM generation_jobs WHERE id=%s", (job_id,))
+    job = cur.fetchone()
+    if job:
+        job["params"] = json.loads(job["params"])
+        job["unplaced_detail"] = json.loads(job["unplaced_detail"] or "{}")
+    return job
+
+
+def cancel_job(cur, job_id):
+    """Cancel a queued job outright, or flag a running one; returns False if the job is already over"""
+    # finished_at is set before state, as MySQL assigns left to right
+    cur.execute("""
+        UPDATE generation_jobs
+        SET cancel_requested=1,
+            finished_at=IF(state='queued', NOW(), finished_at),
+            state=IF(state='queued', 'cancelled', state)
+        WHERE id=%s AND state IN ('queued', 'running')
+    """, (job_id,))
+    return cur.rowcount > 0
+
+
+def recover_jobs(cur):
+    """Fail queued or running jobs whose worker stopped beating; returns how many"""
+    cur.execute("""
+        UPDATE generation_jobs
+        SET state='failed', finished_at=NOW(), message='The server stopped before the job finished'
+        WHERE state IN ('queued', 'running')
+          AND COALESCE(heartbeat_at, created_at) < NOW() - INTERVAL %s SECOND
+    """, (JOB_STALE_SECONDS,))
+    return cur.rowcount
+
+
+def _heartbeat():
+    """Daemon thread of a web worker: stamp its jobs, then fail other workers' orphans"""
+    while True:
+        try:
+            conn = connect()
+            try:
+                with _active_lock:
+                    job_ids = list(_active)
+                with conn.cursor() as cur:
+                    if job_ids:
+                        cur.execute(
+                            f"UPDATE generation_jobs SET heartbeat_at=NOW() WHERE {in_clause('id', job_ids)}",
+                            job_ids
+                        )
+                    recover_jobs(cur)
+                conn.commit()
+            finally:
+                conn.close()
+        except Exception:
+            traceback.print_exc()
+        time.sleep(HEARTBEAT_SECONDS)
+
+
+def _finished(job_id, future):
+    with _active_lock:
+        _active.discard(job_id)
+    error = future.exception()
+    if error is None:
+        return
+    # run_job never raises, so the job's process died (e.g. killed for memory)
+    conn = connect()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                "UPDATE generation_jobs SET state='failed', finished_at=NOW(), message=%s "
+                "WHERE id=%s AND state IN ('queued', 'running')",
+                (f"Job process stopped: {error}"[:500], job_id)
+            )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def submit(job_id, engine):
+    """Run a committed job in the background pool"""
+    global _pool
+    pool = _get_pool()
+    with _active_lock:
+        _active.add(job_id)
+    try:
+        future = pool.submit(run_job, job_id, engine)
+    except BrokenProcessPool:
+        # A dead job process breaks the whole pool; start a new one
+        _pool = None
+        future = _get_pool().submit(run_job, job_id, engine)
+    future.add_done_callback(lambda f: _finished(job_id, f))
+
+
+def _update(conn, job_id, **fields):
+    columns = ", ".join(f"{name}=%s" for name in fields)
+    with conn.cursor() as cur:
+        cur.execute(f"UPDATE generation_jobs SET {columns} WHERE id=%s", (*fields.values(), job_id))
+    conn.commit()
+
+
+class _CancelFlag:
+    """Cancellation token reading the job's cancel_requested column, at most every CANCEL_POLL_SECONDS"""
+
+    def __init__(self, conn, job_id):
+        self.conn = conn
+        self.job_id = job_id
+        self.checked = 0.0
+        self.value = False
+
+    def is_set(self):
+        now = time.monotonic()
+        if not self.value and now - self.checked >= CANCEL_POLL_SECONDS:
+            self.checked = now
+            with self.conn.cursor() as cur:
+                cur.execute("SELECT cancel_requested FROM generation_jobs WHERE id=%s", (self.job_id,))
+                row = cur.fetchone()
+            self.conn.commit()
+            self.value = bool(row and row["cancel_requested"])
+        return self.value
+
+
+def _progress_writer(conn, job_id):
+    """on_progress callback storing an engine's progress on the job row"""
+    def write(report):
+        fields = {"solve_seconds": report["elapsed"]}
+        placed, unplaced = report.get("placed"), report.get("unplaced")
+        if placed is not None and unplaced is not None:
+            fields.update(placed=placed, unplaced=unplaced)
+            if placed + unplaced:
+                fields["progress"] = 20 + 60 * placed // (placed + unplaced)
+        if report.get("score") is not None:
+            fields["score"] = report["score"]
+        _update(conn, job_id, **fields)
+    return write
+
+
+def run_job(job_id, engine):
+    """Worker-side body of a job; never raises, failures are stored on the row"""
+    # Its own connection: a pool process must never touch the web worker's pooled ones
+    conn = connect()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                "UPDATE generation_jobs SET state='running', started_at=NOW(), progress=5 "
+                "WHERE id=%s AND state='queued'",
+                (job_id,)
+            )
+            claimed = cur.rowcount
+        conn.commit()
+        if not claimed:
+            return
+
+        started = time.perf_counter()
+        with conn.cursor() as cur:
+            params = get_job(cur, job_id)["params"]
+            if params.get("classes"):
+                classes = [tuple(c) for c in params["classes"]]
+            else:
+                classes = load_classes(cur, params.get("semester"))
+            problem = load_snapshot(cur, classes)
+        conn.commit()
+        if not problem.lessons:
+            raise ValueError("No staff assigned to subjects for these classes")
+        _update(conn, job_id, progress=20)
+
+        cancel = _CancelFlag(conn, job_id)
+        options = dict(params.get("options", {}))
+        control = RunControl(options.pop("time_budget", None), cancel, _progress_writer(conn, job_id))
+        result = run_engine(problem, engine, control=control, **options)
+        if cancel.is_set():
+            with conn.cursor() as cur:
+                cur.execute(
+                    "UPDATE generation_jobs SET state='cancelled', finished_at=NOW() WHERE id=%s",
+                    (job_id,)
+                )
+            conn.commit()
+            return
+        _update(conn, job_id, progress=80, solve_seconds=result.elapsed)
+
+        with conn.cursor() as cur:
+            save_result(cur, problem, result)
+            cur.execute("""
+                UPDATE generation_jobs
+                SET state='done', progress=100, finished_at=NOW(),
+                    placed=%s, unplaced=%s, unplaced_detail=%s, seed=%s, score=%s, total_seconds=%s
+                WHERE id=%s AND state='running' AND cancel_requested=0
+            """, (
+                result.placed_count, result.unplaced_count, json.dumps(result.unplaced),
+                result.seed, result.penalty, time.perf_counter() - started, job_id
+            ))
+            if not cur.rowcount:
+                # Cancelled after the last poll of the flag, or failed by recover_jobs (its web worker
+                # was gone): save nothing
+                conn.rollback()
+                cur.execute(
+                    "UPDATE generation_jobs SET state='cancelled', finished_at=NOW() "
+                    "WHERE id=%s AND state='running'",
+                    (job_id,)
+                )
+                conn.commit()
+                return
+        conn.commit()
+    except Exception as e:
+        traceback.print_exc()
+        conn.rollback()
+        with conn.cursor() as cur:
+            cur.execute(
+                "UPDATE generation_jobs SET state='failed', finished_at=NOW(), message=%s WHERE id=%s",
+                (str(e)[:500], job_id)
+            )
+        conn.commit()
+    finally:
+        conn.close()
@@ -0,0 +1,242 @@
+"""
+Versioned schema migrations.
+
+database/schema.sql is the baseline; every change after it is a numbered
+migration here, applied in order and recorded in ``schema_migrations``.
+MySQL commits each DDL statement on its own, so a migration cannot be
+rolled back halfway. Instead every step checks information_schema first and
+does nothing when its change is already there: re-running after a crash, or
+on a database that was patched by hand, finishes the job without errors or
+data loss. A named lock keeps two runners (e.g. two deploys) from
+interleaving.
+"""
+from dataclasses import dataclass
+from typing import Tuple
+
+LOCK_NAME = "ttms_schema_migrations"
+LOCK_TIMEOUT = 60
+
+
+def _table_exists(cur, table):
+    cur.execute(
+        "SELECT 1 FROM information_schema.TABLES WHERE TABLE_SCHEMA=DATABASE() AND TABLE_NAME=%s",
+        (table,)
+    )
+    return cur.fetchone() is not None
+
+
+def _column_type(cur, table, column):
+    cur.execute("""
+        SELECT COLUMN_TYPE FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA=DATABASE() AND TABLE_NAME=%s AND COLUMN_NAME=%s
+    """, (table, column))
+    row = cur.fetchone()
+    return row["COLUMN_TYPE"] if row else None
+
+
+def _indexes(cur, table):
+    """index name -> (unique, column tuple) of table"""
+    cur.execute("""
+        SELECT INDEX_NAME, NON_UNIQUE, COLUMN_NAME FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA=DATABASE() AND TABLE_NAME=%s
+        ORDER BY INDEX_NAME, SEQ_IN_INDEX
+    """, (table,))
+    indexes = {}
+    for row in cur.fetchall():
+        unique, columns = indexes.get(row["INDEX_NAME"], (not row["NON_UNIQUE"], ()))
+        indexes[row["INDEX_NAME"]] = unique, columns + (row["COLUMN_NAME"],)
+    return indexes
+
+
+@dataclass(frozen=True)
+class CreateTable:
+    table: str
+    definition: str
+
+    def apply(self, cur):
+        if not _table_exists(cur, self.table):
+            cur.execute(f"CREATE TABLE {self.table} ({self.definition})")
+
+
+@dataclass(frozen=True)
+class AddColumn:
+    table: str
+    column: str
+    definition: str
+
+    def apply(self, cur):
+        if _column_type(cur, self.table, self.column) is None:
+            cur.execute(f"ALTER TABLE {self.table} ADD COLUMN {self.column} {self.definition}")
+
+
+@dataclass(frozen=True)
+class ModifyColumn:
+    table: str
+    column: str
+    # COLUMN_TYPE the column has once modified, lower case as information_schema reports it
+    column_type: str
+    definition: str
+
+    def apply(self, cur):
+        if _column_type(cur, self.table, self.column) != self.column_type:
+            cur.execute(f"ALTER TABLE {self.table} MODIFY {self.column} {self.definition}")
+
+
+@dataclass(frozen=True)
+class AddIndex:
+    table: str
+    name: str
+    columns: Tuple[str, ...]
+    unique: bool = False
+
+    def apply(self, cur):
+        if self.name not in _indexes(cur, self.table):
+            kind = "UNIQUE INDEX" if self.unique else "INDEX"
+            cur.execute(f"ALTER TABLE {self.table} ADD {kind} {self.name} ({', '.join(self.columns)})")
+
+
+@dataclass(frozen=True)
+class DropUnique:
+    """Drop the unique key on exactly these columns, whatever MySQL named it"""
+    table: str
+    columns: Tuple[str, ...]
+
+    def apply(self, cur):
+        for name, (unique, columns) in _indexes(cur, self.table).items():
+            if unique and columns == self.columns and name != "PRIMARY":
+                cur.execute(f"ALTER TABLE {self.table} DROP INDEX {name}")
+
+
+@dataclass(frozen=True)
+class Run:
+    """A data statement; it must give the same result when repeated"""
+    sql: str
+
+    def apply(self, cur):
+        cur.execute(self.sql)
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    steps: tuple
+
+
+MIGRATIONS = [
+    Migration(1, "semester on subjects and timetable", (
+        AddColumn("subjects", "semester", "ENUM('ODD','EVEN') NOT NULL DEFAULT 'ODD' AFTER course_id"),
+        AddColumn("timetable", "semester", "ENUM('ODD','EVEN') NOT NULL DEFAULT 'ODD' AFTER course_id"),
+        # A class is (year, course_id, semester): its ODD and EVEN timetables may use the same slot
+        AddIndex("timetable", "uq_timetable_class_slot", ("year", "course_id", "semester", "day", "period_id"), unique=True),
+        DropUnique("timetable", ("day", "period_id", "year", "course_id")),
+    )),
+    Migration(2, "subject block length", (
+        AddColumn("subjects", "block_length", "INT NOT NULL DEFAULT 1"),
+    )),
+    Migration(3, "generation jobs", (
+        CreateTable("generation_jobs", """
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            scope ENUM('class','all') NOT NULL,
+            params TEXT NOT NULL,
+            state ENUM('queued','running','done','failed') NOT NULL DEFAULT 'queued',
+            progress INT NOT NULL DEFAULT 0,
+            placed INT,
+            unplaced INT,
+            unplaced_detail TEXT,
+            seed BIGINT,
+            message VARCHAR(500),
+            solve_seconds DOUBLE,
+            total_seconds DOUBLE,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            started_at DATETIME,
+            finished_at DATETIME
+        """),
+    )),
+    Migration(4, "generation job cancellation and score", (
+        ModifyColumn(
+            "generation_jobs", "state", "enum('queued','running','done','failed','cancelled')",
+            "ENUM('queued','running','done','failed','cancelled') NOT NULL DEFAULT 'queued'"
+        ),
+        AddColumn("generation_jobs", "cancel_requested", "TINYINT(1) NOT NULL DEFAULT 0"),
+        AddColumn("generation_jobs", "score", "DOUBLE"),
+    )),
+    Migration(5, "indexes for timetable and subject lookups", (
+        # Class timetable views, regeneration DELETEs and snapshot loads filter on the class
+        # and read slot, subject, staff and room: all served from the index
+        AddIndex("timetable", "idx_timetable_class",
+                 ("year", "course_id", "semester", "day", "period_id", "subject_id", "staff_id", "classroom_id")),
+        # Faculty schedules, delete_faculty and the workload view go by staff, ordered by day
+        AddIndex("timetable", "idx_timetable_staff_day", ("staff_id", "day", "period_id", "subject_id", "year", "course_id")),
+        # Snapshot subject loads and load_classes filter subjects by class
+        AddIndex("subjects", "idx_subjects_class", ("year", "course_id", "semester")),
+    )),
+    Migration(6, "staff load summary", (
+        CreateTable("staff_load", """
+            staff_id INT NOT NULL,
+            semester ENUM('ODD','EVEN') NOT NULL,
+            day ENUM('Monday','Tuesday','Wednesday','Thursday','Friday') NOT NULL,
+            hours INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (staff_id, semester, day),
+            FOREIGN KEY (staff_id) REFERENCES staff(id) ON DELETE CASCADE
+        """),
+        # Backfill from the timetable (see utils/workload.py)
+        Run("DELETE FROM staff_load"),
+        Run("""
+            INSERT INTO staff_load (staff_id, semester, day, hours)
+            SELECT staff_id, semester, day, COUNT(*) FROM timetable GROUP BY staff_id, semester, day
+        """),
+    )),
+    Migration(7, "reference data versions", (
+        # Per-table change counters behind the cache in utils/refdata.py
+        CreateTable("ref_data_versions", """
+            name VARCHAR(50) PRIMARY KEY,
+            version BIGINT NOT NULL DEFAULT 0
+        """),
+        Run("""
+            INSERT IGNORE INTO ref_data_versions (name, version)
+            VALUES ('periods', 0), ('courses', 0), ('classrooms', 0), ('subjects', 0)
+        """),
+    )),
+    Migration(8, "generation job heartbeat", (
+        AddColumn("generation_jobs", "heartbeat_at", "DATETIME"),
+    )),
+]
+
+
+def current_version(cur):
+    if not _table_exists(cur, "schema_migrations"):
+        return 0
+    cur.execute("SELECT COALESCE(MAX(version), 0) AS version FROM schema_migrations")
+    return cur.fetchone()["version"]
+
+
+def migrate(conn, target=None, log=print):
+    """Apply pending migrations up to target (all by default); returns the versions applied"""
+    applied = []
+    with conn.cursor() as cur:
+        cur.execute("SELECT GET_LOCK(%s, %s) AS locked", (LOCK_NAME, LOCK_TIMEOUT))
+        if not cur.fetchone()["locked"]:
+            raise RuntimeError("Another migration run holds the lock")
+        try:
+            CreateTable("schema_migrations", """
+                version INT PRIMARY KEY,
+                name VARCHAR(200) NOT NULL,
+                applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            """).apply(cur)
+            version = current_version(cur)
+            for migration in MIGRATIONS:
+                if migration.version <= version or (target is not None and migration.version > target):
+                    continue
+                log(f"Applying migration {migration.version}: {migration.name}")
+                for step in migration.steps:
+                    step.apply(cur)
+                cur.execute(
+                    "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                    (migration.version, migration.name)
+                )
+                conn.commit()
+                applied.append(migration.version)
+        finally:
+            cur.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+    return applied
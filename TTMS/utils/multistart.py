@@ -0,0 +1,69 @@
+"""
+Multi-start generation: run K seeded attempts of an engine in worker
+processes on the same Problem and keep the best one.
+
+Attempts are ranked by unplaced hours, then by soft-constraint penalty. The
+winning Result carries its seed, so ``engine(problem, seed=result.seed)``
+reproduces it exactly.
+
+Workers get the run's deadline, so every attempt stops on time. A cancelled
+run stops handing out attempts and keeps the best of those already finished.
+"""
+import random
+from concurrent.futures import as_completed
+
+from utils.control import UNLIMITED, RunControl
+from utils.parallel import WORKERS, process_pool
+from utils.quality import soft_penalty
+
+STARTS = 8
+
+# Problem and engine of the current worker process, set once by _init_worker
+_worker = {}
+
+
+def _init_worker(problem, engine, deadline=None):
+    _worker.update(problem=problem, engine=engine, control=RunControl(deadline=deadline))
+
+
+def _attempt(seed):
+    problem = _worker["problem"]
+    result = _worker["engine"](problem, seed=seed, control=_worker["control"])
+    result.penalty = soft_penalty(problem, result.placements)
+    return result
+
+
+def _rank(result):
+    return result.unplaced_count, result.penalty
+
+
+def solve_multistart(problem, engine, starts=STARTS, workers=WORKERS, seed=None, control=UNLIMITED):
+    """Best Result of `starts` runs of engine seeded seed, seed + 1, ..."""
+    if seed is None:
+        seed = random.randrange(2 ** 31)
+    seeds = [seed + i for i in range(starts)]
+    workers = max(1, min(workers, starts))
+
+    results = []
+    if workers > 1:
+        initargs = (problem, engine, control.deadline)
+        with process_pool(workers, initializer=_init_worker, initargs=initargs) as pool:
+            futures = [pool.submit(_attempt, s) for s in seeds]
+            for future in as_completed(futures):
+                results.append(future.result())
+                best = min(results, key=_rank)
+                control.report(placed=best.placed_count, unplaced=best.unplaced_count,
+                               score=best.penalty, attempts=len(results))
+                if control.cancelled():
+                    for pending in futures:
+                        pending.cancel()
+                    break
+    else:
+        _worker.update(problem=problem, engine=engine, control=control)
+        for s in seeds:
+            results.append(_attempt(s))
+            if control.stopped():
+                break
+
+    return min(results, key=_rank)
+
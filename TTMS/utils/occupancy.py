@@ -0,0 +1,219 @@
+"""
+Bitset occupancy index for the week grid.
+
+Slot ``d * n_periods + p`` is bit ``slot`` of an int mask, so the 5x7 week fits
+in one integer per staff member, room and class. Free-slot queries become a
+single AND/NOT, and each slot also keeps a mask of its busy rooms so the first
+free room is a lowest-zero-bit scan instead of probing every room.
+
+Rooms are grouped into one pool per room type (largest rooms first), and
+each pool keeps the mask of slots in which all of its rooms are taken, so a
+lesson only ever looks at rooms of the type it needs.
+
+Staff with a max_hours limit also carry a remaining-hours budget that every
+booking draws down; a staff member with no budget left has no free slots.
+
+Lessons taught in blocks of consecutive periods use the precomputed mask of
+legal block starts (within one day, not across lunch): the free starts of a
+block are that mask ANDed with the free-slot mask shifted once per period.
+"""
+
+
+def iter_bits(mask):
+    """Yield the indexes of the set bits of mask, lowest first"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class Occupancy:
+    def __init__(self, days, period_nos, rooms, lunch_after=None):
+        self.days = list(days)
+        self.period_nos = list(period_nos)
+        self.n_periods = len(self.period_nos)
+        self.n_slots = len(self.days) * self.n_periods
+        self.full = (1 << self.n_slots) - 1
+        self.day_index = {day: i for i, day in enumerate(self.days)}
+        self.period_index = {p: i for i, p in enumerate(self.period_nos)}
+        self.day_masks = [
+            ((1 << self.n_periods) - 1) << (d * self.n_periods)
+            for d in range(len(self.days))
+        ]
+        self.lunch_after = lunch_after
+        self._block_starts = {1: self.full}
+
+        rooms = sorted(rooms, key=lambda r: (r.room_type, -r.capacity, r.id))
+        self.room_ids = [r.id for r in rooms]
+        self.room_bit = {room_id: i for i, room_id in enumerate(self.room_ids)}
+        self.all_rooms = (1 << len(self.room_ids)) - 1
+        # Per room type: bitmask of its rooms (bit i = self.room_ids[i])
+        self.pools = {}
+        self.room_type = {}
+        for i, r in enumerate(rooms):
+            self.pools[r.room_type] = self.pools.get(r.room_type, 0) | (1 << i)
+            self.room_type[r.id] = r.room_type
+
+        self.staff = {}
+        self.room = {}
+        self.klass = {}
+        # Per slot: bitmask of busy rooms (bit i = self.room_ids[i])
+        self.slot_rooms = [0] * self.n_slots
+        # Slots in which every room is taken, overall and per pool
+        self.rooms_full = 0
+        self.pool_full = {room_type: 0 for room_type in self.pools}
+        # staff_id -> hours left under max_hours, for staff that have a limit
+        self.budget = {}
+
+    @classmethod
+    def from_problem(cls, problem):
+        occ = cls(problem.days, problem.period_nos, problem.rooms, problem.lunch_after)
+        # Committed hours in other classes come off the budget as their bookings are made
+        occ.budget = dict(problem.staff_max_hours)
+        for b in problem.bookings:
+            slot = occ.slot(b.day, b.period_no)
+            if slot is not None:
+                occ.book(slot, b.staff_id, b.classroom_id)
+        return occ
+
+    def slot(self, day, period_no):
+        """Slot index for (day, period_no), or None if it is outside the grid"""
+        d = self.day_index.get(day)
+        p = self.period_index.get(period_no)
+        if d is None or p is None:
+            return None
+        return d * self.n_periods + p
+
+    def day_period(self, slot):
+        d, p = divmod(slot, self.n_periods)
+        return self.days[d], self.period_nos[p]
+
+    def block_starts(self, length):
+        """Mask of slots where a block of `length` periods may start"""
+        mask = self._block_starts.get(length)
+        if mask is None:
+            day_mask = 0
+            for p in range(self.n_periods - length + 1):
+                if self.lunch_after not in self.period_nos[p:p + length - 1]:
+                    day_mask |= 1 << p
+            mask = 0
+            for d in range(len(self.days)):
+                mask |= day_mask << (d * self.n_periods)
+            self._block_starts[length] = mask
+        return mask
+
+    def pool(self, room_type=None):
+        """
+        Room mask for room_type. Without a type, or when the institution has
+        no room of that type, every room qualifies.
+        """
+        return self.pools.get(room_type) or self.all_rooms
+
+    def full_slots(self, room_type=None):
+        """Mask of slots in which no room of room_type is free"""
+        return self.pool_full.get(room_type, self.rooms_full)
+
+    def budget_left(self, staff_id):
+        """Hours staff_id can still be booked for; unlimited staff are capped by the week"""
+        return self.budget.get(staff_id, self.n_slots)
+
+    def free_slots(self, staff_id, class_key, room_type=None):
+        """Mask of slots where the staff member, the class and at least one suitable room are free"""
+        if self.budget_left(staff_id) <= 0:
+            return 0
+        busy = self.staff.get(staff_id, 0) | self.klass.get(class_key, 0) | self.full_slots(room_type)
+        return ~busy & self.full
+
+    def free_starts(self, staff_id, class_key, room_type=None, length=1):
+        """Mask of slots where a block of `length` periods can start, in one room throughout"""
+        if self.budget_left(staff_id) < length:
+            return 0
+        free = self.free_slots(staff_id, class_key, room_type)
+        starts = free & self.block_starts(length)
+        for k in range(1, length):
+            starts &= free >> k
+        if length > 1:
+            for slot in iter_bits(starts):
+                if self.free_room(slot, room_type, length) is None:
+                    starts &= ~(1 << slot)
+        return starts
+
+    def free_room(self, slot, room_type=None, length=1):
+        """First room id of room_type's pool free from slot for `length` periods, or None"""
+        busy = 0
+        for s in range(slot, slot + length):
+            busy |= self.slot_rooms[s]
+        free = ~busy & self.pool(room_type)
+        if not free:
+            return None
+        return self.room_ids[(free & -free).bit_length() - 1]
+
+    def book(self, slot, staff_id, room_id, class_key=None, length=1):
+        """Book `length` consecutive slots from slot"""
+        bits = ((1 << length) - 1) << slot
+        self.staff[staff_id] = self.staff.get(staff_id, 0) | bits
+        if staff_id in self.budget:
+            self.budget[staff_id] -= length
+        self.room[room_id] = self.room.get(room_id, 0) | bits
+        if class_key is not None:
+            self.klass[class_key] = self.klass.get(class_key, 0) | bits
+        room_bit = self.room_bit.get(room_id)
+        if room_bit is None:
+            return
+        room_type = self.room_type[room_id]
+        pool = self.pools[room_type]
+        for s in range(slot, slot + length):
+            self.slot_rooms[s] |= 1 << room_bit
+            if self.slot_rooms[s] == self.all_rooms:
+                self.rooms_full |= 1 << s
+            if self.slot_rooms[s] & pool == pool:
+                self.pool_full[room_type] |= 1 << s
+
+    def release(self, slot, staff_id, room_id, class_key=None, length=1):
+        bits = ((1 << length) - 1) << slot
+        self.staff[staff_id] = self.staff.get(staff_id, 0) & ~bits
+        if staff_id in self.budget:
+            self.budget[staff_id] += length
+        self.room[room_id] = self.room.get(room_id, 0) & ~bits
+        if class_key is not None:
+            self.klass[class_key] = self.klass.get(class_key, 0) & ~bits
+        room_bit = self.room_bit.get(room_id)
+        if room_bit is None:
+            return
+        for s in range(slot, slot + length):
+            self.slot_rooms[s] &= ~(1 << room_bit)
+        self.rooms_full &= ~bits
+        self.pool_full[self.room_type[room_id]] &= ~bits
+
+    def units(self, lessons, placements):
+        """
+        Group per-hour placements back into the blocks they were placed as:
+        (lesson, start slot, length, staff_id, room_id) tuples. Consecutive
+        hours of a block lesson with the same staff and room on one day are
+        cut into blocks of lesson.block periods.
+        """
+        lessons = {lesson.subject_id: lesson for lesson in lessons}
+        runs = {}
+        for p in placements:
+            lesson = lessons[p.subject_id]
+            runs.setdefault((lesson.subject_id, p.staff_id, p.classroom_id), []).append(
+                self.slot(p.day, p.period_no)
+            )
+        units = []
+        for (subject_id, staff_id, room_id), slots in runs.items():
+            lesson = lessons[subject_id]
+            slots.sort()
+            start = length = 0
+            for slot in slots + [None]:
+                joins = (
+                    length and slot == start + length and length < lesson.block
+                    and slot // self.n_periods == start // self.n_periods
+                    and self.block_starts(length + 1) >> start & 1
+                )
+                if joins:
+                    length += 1
+                    continue
+                if length:
+                    units.append((lesson, start, length, staff_id, room_id))
+                start, length = slot, 1
+        return units
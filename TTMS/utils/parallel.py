@@ -0,0 +1,19 @@
+"""
+Process pools of the generation engines.
+
+Generation runs inside web requests and jobs, where live threads (the job
+heartbeat, a pool's manager thread) and pooled MySQL sockets exist. Forking
+such a process can deadlock the child on a lock another thread held, so
+every pool starts its processes with ``spawn``.
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+# Worker processes of one multi-start or decomposed run
+WORKERS = int(os.getenv("GENERATION_WORKERS", os.cpu_count() or 1))
+
+
+def process_pool(workers, **kwargs):
+    """ProcessPoolExecutor of `workers` spawned processes; kwargs as for ProcessPoolExecutor"""
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"), **kwargs)
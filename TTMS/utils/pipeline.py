@@ -0,0 +1,66 @@
+"""
+Generation pipeline shared by /generate, /generate_all, jobs and the CLI:
+run an engine (once or multi-start), then post passes on its Result.
+"""
+import random
+from functools import partial
+
+from utils.annealing import optimise as anneal
+from utils.control import RunControl
+from utils.decompose import solve_parts, split
+from utils.feasibility import check as check_feasible
+from utils.multistart import solve_multistart
+from utils.parallel import WORKERS
+from utils.repair import repair_unplaced
+from utils.rooms import assign_rooms
+
+
+def run_engine(problem, engine, starts=1, seed=None, repair=True, optimise=0, check=True,
+               time_budget=None, control=None, decompose=True):
+    """
+    Single seeded run of engine, or the best of `starts` runs. With check, a
+    problem that provably cannot be fully placed raises Infeasible before
+    any search starts; without it the engine places what fits. With repair,
+    hours left unplaced go through the LNS repair pass. Rooms are then matched
+    slot by slot, and optimise > 0 spends that many seconds annealing the
+    soft-constraint penalty.
+
+    time_budget caps the whole run in seconds; control (a RunControl) also
+    carries a cancellation token and a progress callback. When either stops
+    the run, the best timetable found so far is returned: the remaining
+    search passes are skipped but rooms are still matched.
+
+    With decompose, groups of classes that share no staff and no scarce
+    room pool are solved as separate problems in parallel, each through
+    this same pipeline with the same seed. Multi-start runs solve the
+    groups one after another, since each one already uses every worker.
+    """
+    if control is None:
+        control = RunControl(time_budget)
+    if check:
+        check_feasible(problem)
+    if decompose:
+        parts = split(problem)
+        if len(parts) > 1:
+            if seed is None:
+                seed = random.randrange(2 ** 31)
+            solve = partial(_run_part, engine=engine, starts=starts, repair=repair, optimise=optimise)
+            result = solve_parts(parts, solve, seed=seed, workers=1 if starts > 1 else WORKERS, control=control)
+            control.report(force=True, placed=result.placed_count, unplaced=result.unplaced_count, score=result.penalty)
+            return result
+    if starts > 1:
+        result = solve_multistart(problem, engine, starts=starts, seed=seed, control=control)
+    else:
+        result = engine(problem, seed=seed, control=control)
+    if repair and result.unplaced and not control.stopped():
+        result = repair_unplaced(problem, result, seed=result.seed, control=control)
+    result = assign_rooms(problem, result)
+    if optimise > 0 and not control.stopped():
+        result = anneal(problem, result, seed=result.seed, time_budget=optimise, control=control)
+    control.report(force=True, placed=result.placed_count, unplaced=result.unplaced_count, score=result.penalty)
+    return result
+
+
+def _run_part(part, seed, control, **options):
+    """One component of a decomposed run; the whole problem has already been checked"""
+    return run_engine(part, seed=seed, control=control, check=False, decompose=False, **options)
@@ -0,0 +1,121 @@
+"""
+Problem and result model shared by the timetable solver engines.
+
+Everything in here is plain data: a Problem is built once from a database
+snapshot (see utils/snapshot.py) and the engines never touch the database.
+"""
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+
+# A class is identified by (year, course_id, semester)
+ClassKey = Tuple[str, int, str]
+
+# Max allocations of one subject on a single day
+SUBJECT_DAY_CAP = 2
+
+# subjects.required_room / classrooms.room_type
+ROOM_TYPES = ("CLASSROOM", "LAB")
+
+# Longest block of consecutive periods a subject can ask for
+MAX_BLOCK = 3
+
+# Lunch break falls after this period (see timetable_view.html); blocks never straddle it
+LUNCH_AFTER_PERIOD = 4
+
+
+@dataclass(frozen=True)
+class Room:
+    id: int
+    room_type: str = "CLASSROOM"
+    capacity: int = 60
+
+
+@dataclass(frozen=True)
+class Lesson:
+    """A subject of one class, with the staff qualified to teach it"""
+    subject_id: int
+    hours: int
+    staff_ids: Tuple[int, ...]
+    class_key: ClassKey
+    # Room type the subject has to be taught in
+    room_type: str = "CLASSROOM"
+    # Hours are placed in blocks of this many consecutive periods, in one room
+    block: int = 1
+
+    @property
+    def day_cap(self):
+        """Max hours of this lesson on one day; a whole block always fits"""
+        return max(SUBJECT_DAY_CAP, self.block)
+
+    def unit(self, remaining):
+        """Length of the next block to place when `remaining` hours are left"""
+        return min(self.block, remaining)
+
+
+@dataclass(frozen=True)
+class Booking:
+    """An existing timetable row that the solver has to work around"""
+    day: str
+    period_no: int
+    subject_id: int
+    staff_id: int
+    classroom_id: int
+
+
+@dataclass
+class Problem:
+    classes: List[ClassKey]
+    lessons: List[Lesson]
+    rooms: List[Room]
+    period_ids: Dict[int, int]
+    bookings: List[Booking] = field(default_factory=list)
+    days: List[str] = field(default_factory=lambda: list(DAYS))
+    lunch_after: Optional[int] = LUNCH_AFTER_PERIOD
+    # staff_id -> staff.max_hours, for the staff teaching these lessons
+    staff_max_hours: Dict[int, int] = field(default_factory=dict)
+
+    @property
+    def period_nos(self):
+        return sorted(self.period_ids)
+
+    def booked_day_counts(self):
+        """subject_id -> hours already booked per day index, for every lesson; they count towards the day cap"""
+        day_index = {day: d for d, day in enumerate(self.days)}
+        counts = {lesson.subject_id: [0] * len(self.days) for lesson in self.lessons}
+        for b in self.bookings:
+            d = day_index.get(b.day)
+            if b.subject_id in counts and d is not None:
+                counts[b.subject_id][d] += 1
+        return counts
+
+
+@dataclass(frozen=True)
+class Placement:
+    day: str
+    period_no: int
+    subject_id: int
+    staff_id: int
+    classroom_id: int
+    class_key: ClassKey
+
+
+@dataclass
+class Result:
+    placements: List[Placement]
+    # subject_id -> hours that could not be placed
+    unplaced: Dict[int, int] = field(default_factory=dict)
+    engine: str = ""
+    seed: Optional[int] = None
+    elapsed: float = 0.0
+    # Soft-constraint penalty (utils/quality.py), when it has been computed
+    penalty: Optional[int] = None
+
+    @property
+    def placed_count(self):
+        return len(self.placements)
+
+    @property
+    def unplaced_count(self):
+        return sum(self.unplaced.values())
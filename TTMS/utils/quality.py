@@ -0,0 +1,56 @@
+"""
+Soft-constraint scoring of a placement: lower penalty is a nicer timetable.
+
+Hard constraints (double bookings, the per-day subject cap) are handled by
+the engines; this only ranks timetables that already satisfy them.
+"""
+
+# Periods a staff member can teach on one day before it counts as overload
+STAFF_DAY_LIMIT = 4
+
+WEIGHTS = {
+    "class_gap": 3,      # idle period between two lessons of a class
+    "staff_gap": 1,      # idle period between two lessons of a staff member
+    "staff_overload": 4, # each period over STAFF_DAY_LIMIT on one day
+    "subject_double": 1, # a subject taught twice (beyond one block) on the same day
+}
+
+
+def _gaps(period_lists):
+    """Idle periods between the first and last lesson, summed over days"""
+    total = 0
+    for periods in period_lists:
+        if len(periods) > 1:
+            total += max(periods) - min(periods) + 1 - len(periods)
+    return total
+
+
+def soft_breakdown(problem, placements):
+    """Unweighted count of each soft-constraint violation"""
+    class_days = {}
+    staff_days = {}
+    subject_days = {}
+    for p in placements:
+        class_days.setdefault((p.class_key, p.day), []).append(p.period_no)
+        staff_days.setdefault((p.staff_id, p.day), []).append(p.period_no)
+        subject_days[(p.subject_id, p.day)] = subject_days.get((p.subject_id, p.day), 0) + 1
+
+    # A block lesson teaches its block on one day; only more than that is doubled
+    blocks = {lesson.subject_id: lesson.block for lesson in problem.lessons}
+
+    # Staff days are judged on their whole week, including other classes
+    for b in problem.bookings:
+        if (b.staff_id, b.day) in staff_days:
+            staff_days[(b.staff_id, b.day)].append(b.period_no)
+
+    return {
+        "class_gap": _gaps(class_days.values()),
+        "staff_gap": _gaps(staff_days.values()),
+        "staff_overload": sum(max(0, len(p) - STAFF_DAY_LIMIT) for p in staff_days.values()),
+        "subject_double": sum(1 for (sid, _), n in subject_days.items() if n > blocks.get(sid, 1)),
+    }
+
+
+def soft_penalty(problem, placements):
+    breakdown = soft_breakdown(problem, placements)
+    return sum(WEIGHTS[name] * count for name, count in breakdown.items())
@@ -0,0 +1,162 @@
+"""
+Process-local cache of small, rarely changing reference tables: periods,
+courses, classrooms and the subject catalog.
+
+Each table has a version counter in ``ref_data_versions``. Admin routes
+that change a table call ``invalidate`` in the same transaction, which
+bumps its counter and drops this process's copy. Every other process
+(gunicorn workers, job workers) compares its versions with the table at
+most once every CHECK_SECONDS and reloads only what changed, so between
+checks a lookup is a dict read. Callers that must not see stale data,
+such as the generation snapshot, pass ``check=True``.
+"""
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+# Seconds a process trusts its versions before asking the database again
+CHECK_SECONDS = 5.0
+
+
+@dataclass(frozen=True)
+class Period:
+    id: int
+    period_no: int
+    # "HH:MM:SS"
+    start_time: str
+    end_time: str
+
+
+@dataclass(frozen=True)
+class Course:
+    id: int
+    name: str
+
+
+@dataclass(frozen=True)
+class Classroom:
+    id: int
+    room_code: str
+    room_type: str
+    capacity: int
+
+
+@dataclass(frozen=True)
+class Subject:
+    id: int
+    code: str
+    name: str
+    weekly_hours: int
+    year: str
+    course_id: int
+    semester: str
+    required_room: str
+    block_length: int
+
+
+def _time(value):
+    """TIME columns arrive as timedelta; format as HH:MM:SS"""
+    seconds = int(value.total_seconds())
+    return f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+def _load_periods(cur):
+    cur.execute("SELECT id, period_no, start_time, end_time FROM periods ORDER BY period_no")
+    return [Period(r["id"], r["period_no"], _time(r["start_time"]), _time(r["end_time"])) for r in cur.fetchall()]
+
+
+def _load_courses(cur):
+    cur.execute("SELECT id, name FROM courses ORDER BY id")
+    return [Course(r["id"], r["name"]) for r in cur.fetchall()]
+
+
+def _load_classrooms(cur):
+    cur.execute("SELECT id, room_code, room_type, capacity FROM classrooms ORDER BY id")
+    return [Classroom(r["id"], r["room_code"], r["room_type"], int(r["capacity"] or 0)) for r in cur.fetchall()]
+
+
+def _load_subjects(cur):
+    cur.execute("""
+        SELECT id, code, name, weekly_hours, year, course_id, semester, required_room, block_length
+        FROM subjects
+        ORDER BY id
+    """)
+    return [
+        Subject(
+            r["id"], r["code"], r["name"], int(r["weekly_hours"]), r["year"], int(r["course_id"]),
+            r["semester"], r["required_room"], int(r["block_length"] or 1),
+        )
+        for r in cur.fetchall()
+    ]
+
+
+LOADERS = {
+    "periods": _load_periods,
+    "courses": _load_courses,
+    "classrooms": _load_classrooms,
+    "subjects": _load_subjects,
+}
+
+# name -> (version, rows) of this process; versions as last read from the database
+_entries = {}
+_versions = {}
+_checked = 0.0
+
+
+def _refresh_versions(cur, force):
+    global _checked
+    now = time.monotonic()
+    if not force and now - _checked < CHECK_SECONDS:
+        return
+    cur.execute("SELECT name, version FROM ref_data_versions")
+    _versions.clear()
+    _versions.update((r["name"], r["version"]) for r in cur.fetchall())
+    _checked = now
+
+
+def _get(cur, name, check=False):
+    _refresh_versions(cur, check)
+    version = _versions.get(name, 0)
+    entry = _entries.get(name)
+    if entry is None or entry[0] != version:
+        entry = (version, LOADERS[name](cur))
+        _entries[name] = entry
+    return entry[1]
+
+
+def invalidate(cur, *names):
+    """Mark tables as changed for every process; call in the transaction that changes them"""
+    cur.executemany(
+        "INSERT INTO ref_data_versions (name, version) VALUES (%s, 1) "
+        "ON DUPLICATE KEY UPDATE version = version + 1",
+        [(name,) for name in names]
+    )
+    for name in names:
+        _entries.pop(name, None)
+    # Re-read versions on the next lookup so this process sees its own change at once
+    global _checked
+    _checked = 0.0
+
+
+def periods(cur, check=False):
+    return _get(cur, "periods", check)
+
+
+def courses(cur, check=False):
+    return _get(cur, "courses", check)
+
+
+def course_name(cur, course_id) -> Optional[str]:
+    try:
+        course_id = int(course_id)
+    except (TypeError, ValueError):
+        return None
+    return next((c.name for c in courses(cur) if c.id == course_id), None)
+
+
+def classrooms(cur, check=False):
+    return _get(cur, "classrooms", check)
+
+
+def subjects(cur, check=False):
+    return _get(cur, "subjects", check)
@@ -0,0 +1,212 @@
+"""
+Large-neighbourhood search repair for hours an engine left unplaced.
+
+Each move takes one missing hour (or block), picks a slot and staff member
+for it, rips out the placements that stand in the way there (same staff,
+same class slot, or a room holder when the slot has no free room), places
+the missing hour and re-inserts the ripped lessons wherever they still fit. A move is kept only
+if it lowers the number of unplaced hours. Existing bookings of other classes
+are never moved, and neither are pinned placements of the problem's own
+classes (see utils/impact.py).
+"""
+import random
+import time
+
+from utils.control import UNLIMITED
+from utils.occupancy import Occupancy, iter_bits
+from utils.problem import Placement, Result
+
+TIME_BUDGET = 2.0
+# Give up early after this many rejected moves in a row
+MAX_STALL = 2000
+
+
+class _State:
+    def __init__(self, problem, result, pinned=()):
+        self.problem = problem
+        self.occ = Occupancy.from_problem(problem)
+        self.lessons = {lesson.subject_id: lesson for lesson in problem.lessons}
+        self.day_counts = problem.booked_day_counts()
+
+        self.remaining = {sid: lesson.hours for sid, lesson in self.lessons.items()}
+        for lesson, slot, length, staff_id, room_id in self.occ.units(problem.lessons, pinned):
+            self.occ.book(slot, staff_id, room_id, lesson.class_key, length)
+            self.day_counts[lesson.subject_id][slot // self.occ.n_periods] += length
+            self.remaining[lesson.subject_id] -= length
+
+        # Bookings and pinned placements are fixed; remember them to tell what can be ripped
+        self.fixed_staff = dict(self.occ.staff)
+        self.fixed_class = dict(self.occ.klass)
+        self.fixed_full = {room_type: self.occ.full_slots(room_type) for room_type in self.occ.pools}
+        self.fixed_rooms_full = self.occ.rooms_full
+
+        # pid -> (lesson, start slot, length, staff_id, room_id); blocks move as a whole
+        self.placed = {}
+        self.by_slot = [set() for _ in range(self.occ.n_slots)]
+        self.next_id = 0
+        for unit in self.occ.units(problem.lessons, result.placements):
+            self.add(*unit)
+
+    def add(self, lesson, slot, length, staff_id, room_id=None):
+        if room_id is None:
+            room_id = self.occ.free_room(slot, lesson.room_type, length)
+        self.occ.book(slot, staff_id, room_id, lesson.class_key, length)
+        self.day_counts[lesson.subject_id][slot // self.occ.n_periods] += length
+        self.remaining[lesson.subject_id] -= length
+        pid = self.next_id
+        self.next_id += 1
+        self.placed[pid] = (lesson, slot, length, staff_id, room_id)
+        for s in range(slot, slot + length):
+            self.by_slot[s].add(pid)
+        return pid
+
+    def remove(self, pid):
+        lesson, slot, length, staff_id, room_id = self.placed.pop(pid)
+        self.occ.release(slot, staff_id, room_id, lesson.class_key, length)
+        self.day_counts[lesson.subject_id][slot // self.occ.n_periods] -= length
+        self.remaining[lesson.subject_id] += length
+        for s in range(slot, slot + length):
+            self.by_slot[s].discard(pid)
+        return lesson, slot, length, staff_id, room_id
+
+    def open_days(self, lesson, length):
+        counts = self.day_counts[lesson.subject_id]
+        mask = 0
+        for d, day_mask in enumerate(self.occ.day_masks):
+            if counts[d] + length <= lesson.day_cap:
+                mask |= day_mask
+        return mask
+
+    def values(self, lesson, length):
+        """Every (slot, staff_id) where a block of lesson fits right now"""
+        allowed = self.open_days(lesson, length)
+        return [
+            (slot, staff_id)
+            for staff_id in lesson.staff_ids
+            for slot in iter_bits(
+                self.occ.free_starts(staff_id, lesson.class_key, lesson.room_type, length) & allowed
+            )
+        ]
+
+    def targets(self, lesson, length):
+        """(slot, staff_id) block starts not blocked by fixed bookings; current placements may be ripped"""
+        allowed = (
+            self.open_days(lesson, length) & ~self.fixed_full.get(lesson.room_type, self.fixed_rooms_full)
+            & ~self.fixed_class.get(lesson.class_key, 0)
+            & self.occ.full
+        )
+        targets = []
+        for staff_id in lesson.staff_ids:
+            free = allowed & ~self.fixed_staff.get(staff_id, 0)
+            starts = free & self.occ.block_starts(length)
+            for k in range(1, length):
+                starts &= free >> k
+            targets.extend((slot, staff_id) for slot in iter_bits(starts))
+        return targets
+
+    def blockers(self, lesson, slot, length, staff_id, rng):
+        """Placements that must go for a block of lesson to take slot with staff_id, or None"""
+        span = range(slot, slot + length)
+        ripped = {
+            pid for s in span for pid in self.by_slot[s]
+            if self.placed[pid][3] == staff_id or self.placed[pid][0].class_key == lesson.class_key
+        }
+
+        # Rooms still busy across the block once ripped placements are gone, and those held by fixed bookings
+        busy = fixed = 0
+        for s in span:
+            movable = ripped_bits = 0
+            for pid in self.by_slot[s]:
+                bit = 1 << self.occ.room_bit[self.placed[pid][4]]
+                movable |= bit
+                if pid in ripped:
+                    ripped_bits |= bit
+            busy |= self.occ.slot_rooms[s] & ~ripped_bits
+            fixed |= self.occ.slot_rooms[s] & ~movable
+
+        pool = self.occ.pool(lesson.room_type)
+        if not pool & ~busy:
+            # No room of the right type stays free: also free one held only by movable placements
+            candidates = list(iter_bits(pool & ~fixed))
+            if not candidates:
+                return None
+            bit = rng.choice(candidates)
+            ripped |= {
+                pid for s in span for pid in self.by_slot[s]
+                if self.occ.room_bit[self.placed[pid][4]] == bit
+            }
+        return ripped
+
+
+def _try_move(state, lesson, rng):
+    """One LNS move for a missing block of lesson; True if it was kept"""
+    length = lesson.unit(state.remaining[lesson.subject_id])
+    targets = state.targets(lesson, length)
+    if not targets:
+        return False
+    slot, staff_id = rng.choice(targets)
+    blockers = state.blockers(lesson, slot, length, staff_id, rng)
+    if blockers is None:
+        return False
+
+    before = sum(state.remaining.values())
+    ripped = [state.remove(pid) for pid in blockers]
+    if state.occ.free_room(slot, lesson.room_type, length) is None or state.occ.budget_left(staff_id) < length:
+        for entry in ripped:
+            state.add(*entry)
+        return False
+    new_pid = state.add(lesson, slot, length, staff_id)
+
+    reinserted = []
+    rng.shuffle(ripped)
+    for entry in ripped:
+        values = state.values(entry[0], entry[2])
+        if values:
+            start, staff = rng.choice(values)
+            reinserted.append(state.add(entry[0], start, entry[2], staff))
+
+    if sum(state.remaining.values()) < before:
+        return True
+
+    # Revert: drop the new placements and put the ripped ones back where they were
+    for pid in reinserted:
+        state.remove(pid)
+    state.remove(new_pid)
+    for entry in ripped:
+        state.add(*entry)
+    return False
+
+
+def repair_unplaced(problem, result, seed=None, time_budget=TIME_BUDGET, pinned=(), control=UNLIMITED):
+    """
+    Try to place result's unplaced hours; returns a new Result. Pinned
+    placements count towards their lessons' hours, are never ripped and are
+    not part of the returned placements.
+    """
+    if not result.unplaced:
+        return result
+    started = time.perf_counter()
+    rng = random.Random(seed)
+    state = _State(problem, result, pinned)
+    deadline = started + control.budget(time_budget)
+
+    stall = 0
+    while stall < MAX_STALL and time.perf_counter() < deadline and not control.cancelled():
+        missing = [state.lessons[sid] for sid, hours in state.remaining.items() if hours > 0]
+        if not missing:
+            break
+        control.report(unplaced=sum(state.remaining[l.subject_id] for l in missing))
+        stall = 0 if _try_move(state, rng.choice(missing), rng) else stall + 1
+
+    placements = [
+        Placement(*state.occ.day_period(s), lesson.subject_id, staff_id, room_id, lesson.class_key)
+        for lesson, slot, length, staff_id, room_id in state.placed.values()
+        for s in range(slot, slot + length)
+    ]
+    return Result(
+        placements=placements,
+        unplaced={sid: hours for sid, hours in state.remaining.items() if hours > 0},
+        engine=f"{result.engine}+repair",
+        seed=result.seed,
+        elapsed=result.elapsed + time.perf_counter() - started,
+    )
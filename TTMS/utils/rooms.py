@@ -0,0 +1,80 @@
+"""
+Room assignment by bipartite matching.
+
+Engines pick a room as they place each hour, first free room of the right
+pool. Once all times are fixed, ``assign_rooms`` re-seats every slot in one
+step: the lessons sharing a slot are matched to the free rooms of their
+pools with augmenting paths, keeping each engine's choice where it is
+valid. A lesson only loses its hour if no matching can seat it. Hours of
+block lessons keep their rooms, since a block must not change rooms midway.
+"""
+from dataclasses import replace
+
+from utils.occupancy import Occupancy, iter_bits
+
+
+def _match(options):
+    """Maximum matching of rows to room bits; returns {room_bit: row}"""
+    owner = {}
+
+    def augment(row, seen):
+        for bit in options[row]:
+            if bit in seen:
+                continue
+            seen.add(bit)
+            if bit not in owner or augment(owner[bit], seen):
+                owner[bit] = row
+                return True
+        return False
+
+    for row in range(len(options)):
+        augment(row, set())
+    return owner
+
+
+def assign_rooms(problem, result):
+    """Result with every placement in a free room of its lesson's room type"""
+    occ = Occupancy.from_problem(problem)
+    room_types = {lesson.subject_id: lesson.room_type for lesson in problem.lessons}
+
+    # A block has to stay in one room, so block lessons keep the rooms they were placed in
+    blocks = {lesson.subject_id for lesson in problem.lessons if lesson.block > 1}
+    placements = []
+    by_slot = {}
+    for p in result.placements:
+        slot = occ.slot(p.day, p.period_no)
+        if p.subject_id in blocks:
+            occ.book(slot, p.staff_id, p.classroom_id)
+            placements.append(p)
+        else:
+            by_slot.setdefault(slot, []).append(p)
+
+    unplaced = dict(result.unplaced)
+    changed = dropped = False
+    for slot, group in by_slot.items():
+        free = ~occ.slot_rooms[slot] & occ.all_rooms
+        options = []
+        for p in group:
+            bits = list(iter_bits(occ.pool(room_types[p.subject_id]) & free))
+            current = occ.room_bit.get(p.classroom_id)
+            if current in bits:
+                bits.remove(current)
+                bits.insert(0, current)
+            options.append(bits)
+
+        seated = {row: bit for bit, row in _match(options).items()}
+        for row, p in enumerate(group):
+            if row not in seated:
+                unplaced[p.subject_id] = unplaced.get(p.subject_id, 0) + 1
+                changed = dropped = True
+                continue
+            room_id = occ.room_ids[seated[row]]
+            if room_id != p.classroom_id:
+                p = replace(p, classroom_id=room_id)
+                changed = True
+            placements.append(p)
+
+    if not changed:
+        return result
+    penalty = None if dropped else result.penalty
+    return replace(result, placements=placements, unplaced=unplaced, penalty=penalty)
@@ -0,0 +1,186 @@
+"""
+Load a solver Problem from the database and write a Result back.
+
+The loader runs a fixed number of queries regardless of how many subjects,
+staff or rooms exist, so the solver itself never needs a DB handle.
+"""
+from utils import refdata
+from utils.problem import Booking, Lesson, Placement, Problem, Room
+from utils.workload import add_placements, delete_timetable
+
+
+def _class_filter(alias, classes):
+    """SQL fragment and params matching any of the given (year, course_id, semester) keys"""
+    clause = " OR ".join(
+        f"({alias}.year=%s AND {alias}.course_id=%s AND {alias}.semester=%s)"
+        for _ in classes
+    )
+    params = [value for key in classes for value in key]
+    return f"({clause})", params
+
+
+def load_classes(cur, semester=None):
+    """Every (year, course_id, semester) that has subjects, optionally for one semester"""
+    query = "SELECT DISTINCT year, course_id, semester FROM subjects"
+    params = []
+    if semester:
+        query += " WHERE semester=%s"
+        params.append(semester)
+    query += " ORDER BY year, course_id, semester"
+    cur.execute(query, params)
+    return [(r["year"], int(r["course_id"]), r["semester"]) for r in cur.fetchall()]
+
+
+def load_snapshot(cur, classes):
+    """Build a Problem for the given class keys from a DictCursor"""
+    classes = [(year, int(course_id), semester) for year, course_id, semester in classes]
+    subject_filter, subject_params = _class_filter("s", classes)
+
+    cur.execute(f"""
+        SELECT s.id, s.weekly_hours, s.year, s.course_id, s.semester, s.required_room, s.block_length
+        FROM subjects s
+        WHERE {subject_filter}
+        ORDER BY s.id
+    """, subject_params)
+    subjects = cur.fetchall()
+
+    cur.execute(f"""
+        SELECT ss.staff_id, ss.subject_id, st.max_hours
+        FROM staff_subjects ss
+        JOIN subjects s ON ss.subject_id = s.id
+        JOIN staff st ON ss.staff_id = st.id
+        WHERE {subject_filter}
+        ORDER BY ss.subject_id, ss.staff_id
+    """, subject_params)
+    staff_map = {}
+    staff_max_hours = {}
+    for row in cur.fetchall():
+        staff_map.setdefault(row["subject_id"], []).append(row["staff_id"])
+        if row["max_hours"] is not None:
+            staff_max_hours[row["staff_id"]] = int(row["max_hours"])
+
+    # Generation must see the latest rooms and periods, so check versions now
+    rooms = [Room(r.id, r.room_type, r.capacity) for r in refdata.classrooms(cur, check=True)]
+    if not rooms:
+        rooms = [Room(1)]
+
+    period_ids = {p.period_no: p.id for p in refdata.periods(cur, check=True)}
+
+    # Existing occupancy of every other class, with period_no resolved by the join
+    timetable_filter, timetable_params = _class_filter("t", classes)
+    cur.execute(f"""
+        SELECT t.day, p.period_no, t.subject_id, t.staff_id, t.classroom_id
+        FROM timetable t
+        JOIN periods p ON t.period_id = p.id
+        WHERE NOT {timetable_filter}
+    """, timetable_params)
+    bookings = [
+        Booking(row["day"], int(row["period_no"]), row["subject_id"], row["staff_id"], row["classroom_id"])
+        for row in cur.fetchall()
+    ]
+
+    lessons = [
+        Lesson(
+            subject_id=s["id"],
+            hours=int(s["weekly_hours"]),
+            staff_ids=tuple(staff_map[s["id"]]),
+            class_key=(s["year"], int(s["course_id"]), s["semester"]),
+            room_type=s["required_room"],
+            block=int(s["block_length"] or 1),
+        )
+        for s in subjects
+        if s["id"] in staff_map
+    ]
+
+    return Problem(
+        classes=classes,
+        lessons=lessons,
+        rooms=rooms,
+        period_ids=period_ids,
+        bookings=bookings,
+        staff_max_hours=staff_max_hours,
+    )
+
+
+def load_unstaffed(cur, classes):
+    """Subjects of the given classes that no staff member teaches, which load_snapshot leaves out"""
+    subject_filter, subject_params = _class_filter("s", classes)
+    cur.execute(f"""
+        SELECT s.id, s.code, s.weekly_hours
+        FROM subjects s
+        LEFT JOIN staff_subjects ss ON ss.subject_id = s.id
+        WHERE {subject_filter} AND ss.subject_id IS NULL
+        ORDER BY s.id
+    """, subject_params)
+    return [{"id": r["id"], "code": r["code"], "hours": int(r["weekly_hours"])} for r in cur.fetchall()]
+
+
+def load_timetable_rows(cur, classes):
+    """Saved timetable rows of the given classes, keyed by "year/course_id/semester" """
+    classes = [(year, int(course_id), semester) for year, course_id, semester in classes]
+    timetables = {"/".join(str(v) for v in key): [] for key in classes}
+    if not classes:
+        return timetables
+    class_filter, params = _class_filter("t", classes)
+    cur.execute(f"""
+        SELECT t.year, t.course_id, t.semester, t.day, p.period_no,
+               s.code, s.name, st.name AS staff_name, c.room_code
+        FROM timetable t
+        JOIN periods p ON t.period_id = p.id
+        JOIN subjects s ON t.subject_id = s.id
+        JOIN staff st ON t.staff_id = st.id
+        JOIN classrooms c ON t.classroom_id = c.id
+        WHERE {class_filter}
+        ORDER BY t.day, p.period_no
+    """, params)
+    for row in cur.fetchall():
+        key = f"{row.pop('year')}/{row.pop('course_id')}/{row.pop('semester')}"
+        timetables[key].append(row)
+    return timetables
+
+
+def load_placements(cur, classes):
+    """Saved timetable rows of the given classes as (row id, Placement) pairs"""
+    classes = [(year, int(course_id), semester) for year, course_id, semester in classes]
+    if not classes:
+        return []
+    class_filter, params = _class_filter("t", classes)
+    cur.execute(f"""
+        SELECT t.id, t.day, p.period_no, t.subject_id, t.staff_id, t.classroom_id,
+               t.year, t.course_id, t.semester
+        FROM timetable t
+        JOIN periods p ON t.period_id = p.id
+        WHERE {class_filter}
+        ORDER BY t.id
+    """, params)
+    return [
+        (row["id"], Placement(
+            row["day"], int(row["period_no"]), row["subject_id"], row["staff_id"], row["classroom_id"],
+            (row["year"], int(row["course_id"]), row["semester"])
+        ))
+        for row in cur.fetchall()
+    ]
+
+
+def save_result(cur, problem, result):
+    """Replace the timetables of the problem's classes with the result in one batch"""
+    if problem.classes:
+        # One statement for every class; executemany would send a DELETE per class
+        class_filter, params = _class_filter("t", problem.classes)
+        delete_timetable(cur, class_filter, params)
+    insert_placements(cur, problem, result.placements)
+
+
+def insert_placements(cur, problem, placements):
+    """Insert placements as timetable rows in one batch, counting them into staff_load"""
+    rows = [
+        (p.day, problem.period_ids[p.period_no], p.subject_id, p.staff_id, p.classroom_id) + p.class_key
+        for p in placements
+    ]
+    if rows:
+        cur.executemany("""
+            INSERT INTO timetable
+            (day, period_id, subject_id, staff_id, classroom_id, year, course_id, semester)
+            VALUES (%s,%s,%s,%s,%s,%s,%s,%s)
+        """, rows)
+        add_placements(cur, placements)
@@ -0,0 +1,89 @@
+"""
+In-memory greedy allocator used by /generate.
+
+Randomised round-robin over subjects: every pass places at most one hour (or
+one block, for block lessons) per subject, rotating the starting day so the
+week fills evenly. Among qualified staff the one with the most max_hours
+budget left is tried first; staff with no budget left are never booked.
+Once the run's control is stopped the hours placed so far are returned.
+"""
+import random
+import time
+
+from utils.control import UNLIMITED
+from utils.occupancy import Occupancy, iter_bits
+from utils.problem import Placement, Result
+
+
+def solve_greedy(problem, seed=None, control=UNLIMITED):
+    """Place as many lesson hours as possible; returns a Result"""
+    started = time.perf_counter()
+    rng = random.Random(seed)
+
+    occ = Occupancy.from_problem(problem)
+    n_days = len(problem.days)
+
+    # subject_id -> allocations per day index, to enforce the per-day cap
+    subject_day_count = problem.booked_day_counts()
+
+    remaining_slots = {lesson.subject_id: lesson.hours for lesson in problem.lessons}
+    placements = []
+
+    max_iterations = sum(remaining_slots.values()) + 100  # Safety check to avoid infinite loops
+    iteration = 0
+    day_index = 0
+    total = sum(remaining_slots.values())
+
+    while any(v > 0 for v in remaining_slots.values()) and iteration < max_iterations:
+        if control.stopped():
+            break
+        iteration += 1
+        control.report(placed=len(placements), unplaced=total - len(placements))
+        open_lessons = [lesson for lesson in problem.lessons if remaining_slots[lesson.subject_id] > 0]
+        rng.shuffle(open_lessons)
+
+        for lesson in open_lessons:
+            subject_id = lesson.subject_id
+            day_counts = subject_day_count[subject_id]
+            length = lesson.unit(remaining_slots[subject_id])
+
+            # Qualified staff with the most max_hours budget left go first, ties in random order
+            staff_order = rng.sample(lesson.staff_ids, len(lesson.staff_ids))
+            staff_order.sort(key=lambda staff_id: -occ.budget_left(staff_id))
+
+            placed = False
+            for staff_id in staff_order:
+                free = occ.free_starts(staff_id, lesson.class_key, lesson.room_type, length)
+
+                # Rotate through days so all days get used before repeating
+                for offset in range(n_days):
+                    d = (day_index + offset) % n_days
+                    if day_counts[d] + length > lesson.day_cap:
+                        continue
+                    day_free = free & occ.day_masks[d]
+                    if not day_free:
+                        continue
+
+                    slot = rng.choice(list(iter_bits(day_free)))
+                    room_id = occ.free_room(slot, lesson.room_type, length)
+                    occ.book(slot, staff_id, room_id, lesson.class_key, length)
+
+                    for s in range(slot, slot + length):
+                        day, period_no = occ.day_period(s)
+                        placements.append(Placement(day, period_no, subject_id, staff_id, room_id, lesson.class_key))
+                    day_counts[d] += length
+                    remaining_slots[subject_id] -= length
+                    day_index = (day_index + 1) % n_days
+                    placed = True
+                    break
+                if placed:
+                    break
+
+    unplaced = {sid: hours for sid, hours in remaining_slots.items() if hours > 0}
+    return Result(
+        placements=placements,
+        unplaced=unplaced,
+        engine="greedy",
+        seed=seed,
+        elapsed=time.perf_counter() - started,
+    )
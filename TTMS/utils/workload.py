@@ -0,0 +1,95 @@
+"""
+Per-staff assigned hours kept in the ``staff_load`` summary table.
+
+staff_load holds one row per (staff, semester, day) with the number of
+timetable rows behind it. Every write to ``timetable`` goes through
+``delete_timetable`` or adds its rows with ``add_placements``, on the same
+cursor and so in the same transaction, which keeps the summary exact
+without aggregating the timetable on reads. ``mismatches`` recounts it
+from the base table for the nightly check (check_staff_load.py).
+"""
+
+UPSERT = """
+    INSERT INTO staff_load (staff_id, semester, day, hours) VALUES (%s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE hours = hours + VALUES(hours)
+"""
+
+
+def add_hours(cur, rows):
+    """Add (staff_id, semester, day, hours) deltas to staff_load in one statement"""
+    rows = [row for row in rows if row[3]]
+    if rows:
+        cur.executemany(UPSERT, rows)
+
+
+def add_placements(cur, placements):
+    """Count newly inserted placements into staff_load"""
+    counts = {}
+    for p in placements:
+        key = (p.staff_id, p.class_key[2], p.day)
+        counts[key] = counts.get(key, 0) + 1
+    add_hours(cur, [key + (hours,) for key, hours in counts.items()])
+
+
+def delete_timetable(cur, where, params):
+    """DELETE the timetable rows matching where (alias t) and take their hours off staff_load"""
+    cur.execute(f"""
+        SELECT t.staff_id, t.semester, t.day, COUNT(*) AS hours
+        FROM timetable t
+        WHERE {where}
+        GROUP BY t.staff_id, t.semester, t.day
+        FOR UPDATE
+    """, params)
+    removed = [(r["staff_id"], r["semester"], r["day"], -r["hours"]) for r in cur.fetchall()]
+    cur.execute(f"DELETE t FROM timetable t WHERE {where}", params)
+    add_hours(cur, removed)
+    return sum(-row[3] for row in removed)
+
+
+def load_workload(cur):
+    """Assigned and remaining hours per staff member, one summary row each"""
+    cur.execute("""
+        SELECT
+            st.id AS staff_id,
+            st.staff_code,
+            st.name AS faculty_name,
+            st.department,
+            st.max_hours,
+            COALESCE(SUM(l.hours), 0) AS assigned_hours,
+            st.max_hours - COALESCE(SUM(l.hours), 0) AS remaining_hours,
+            COALESCE(SUM(IF(l.semester='ODD', l.hours, 0)), 0) AS odd_hours,
+            COALESCE(SUM(IF(l.semester='EVEN', l.hours, 0)), 0) AS even_hours
+        FROM staff st
+        LEFT JOIN staff_load l ON l.staff_id = st.id
+        GROUP BY st.id
+        ORDER BY st.name
+    """)
+    return cur.fetchall()
+
+
+def mismatches(cur):
+    """(staff_id, semester, day, summary hours, counted hours) wherever staff_load is off"""
+    cur.execute("""
+        SELECT staff_id, semester, day, SUM(summary) AS summary, SUM(counted) AS counted
+        FROM (
+            SELECT staff_id, semester, day, hours AS summary, 0 AS counted FROM staff_load
+            UNION ALL
+            SELECT staff_id, semester, day, 0, COUNT(*) FROM timetable GROUP BY staff_id, semester, day
+        ) AS u
+        GROUP BY staff_id, semester, day
+        HAVING SUM(summary) <> SUM(counted)
+        ORDER BY staff_id, semester, day
+    """)
+    return [
+        (r["staff_id"], r["semester"], r["day"], int(r["summary"]), int(r["counted"]))
+        for r in cur.fetchall()
+    ]
+
+
+def rebuild(cur):
+    """Recount staff_load from the timetable"""
+    cur.execute("DELETE FROM staff_load")
+    cur.execute("""
+        INSERT INTO staff_load (staff_id, semester, day, hours)
+        SELECT staff_id, semester, day, COUNT(*) FROM timetable GROUP BY staff_id, semester, day
+    """)